@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+批量推理基准 - 测量不同批大小下的评分吞吐（帧/秒）
+
+用法：
+    python scripts/bench_batch_inference.py                    # 使用NumPy参考模型
+    python scripts/bench_batch_inference.py --model models/nima_mobile.tflite
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ai.inference_backend import NumpyBackend, create_backend
+
+
+def load_backend(model_path, batch_size, num_threads):
+    """按批大小创建后端"""
+    config = {
+        'local_analysis': {
+            'model_path': model_path,
+            'batch_size': batch_size,
+            'num_threads': num_threads,
+        }
+    }
+    return create_backend(config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量推理基准')
+    parser.add_argument('--model', default='', help='模型路径，默认生成NumPy参考模型')
+    parser.add_argument('--frames', type=int, default=32, help='每轮评分的帧数')
+    parser.add_argument('--rounds', type=int, default=5, help='重复轮数')
+    parser.add_argument('--threads', type=int, default=2, help='推理线程数')
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16', help='待测批大小')
+    args = parser.parse_args()
+
+    model_path = args.model
+    if not model_path:
+        model_path = os.path.join(tempfile.gettempdir(), 'reference_nima.npz')
+        NumpyBackend.save_reference_model(model_path)
+
+    # 模拟金字塔代理层输入（320x180）
+    rng = np.random.default_rng(0)
+    frames = [
+        rng.integers(0, 256, size=(180, 320, 3), dtype=np.uint8)
+        for _ in range(args.frames)
+    ]
+
+    print("=" * 50)
+    print(f"批量推理基准: {model_path}")
+    print(f"每轮 {args.frames} 帧，{args.rounds} 轮，{args.threads} 线程")
+    print("=" * 50)
+    print(f"{'批大小':<8}{'帧/秒':>12}{'单帧耗时(ms)':>16}")
+
+    for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+        backend = load_backend(model_path, batch_size, args.threads)
+        if backend is None:
+            print("模型加载失败")
+            return 1
+
+        backend.predict_batch(frames[:batch_size])  # 预热
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            backend.predict_batch(frames)
+        elapsed = time.perf_counter() - start
+
+        fps = args.frames * args.rounds / elapsed
+        print(f"{batch_size:<10}{fps:>12.1f}{1000.0 / fps:>16.2f}")
+
+    print("=" * 50)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+帧统计微基准 - 对比 np.mean/np.std 与直方图统计的单帧耗时
+
+用法：python scripts/bench_frame_stats.py [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ai.frame_pyramid import FramePyramid
+from src.ai.frame_stats import frame_stats, luma_stats
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+
+def make_frame(width, height, seed=0):
+    """生成带渐变和噪声的合成RGBA帧"""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, width, dtype=np.float32)
+    frame = np.empty((height, width, 4), dtype=np.uint8)
+    base = ramp[None, :] * np.linspace(0.3, 1.0, height, dtype=np.float32)[:, None]
+    noise = rng.integers(-20, 20, size=(height, width), dtype=np.int16)
+    for c in range(3):
+        frame[:, :, c] = np.clip(base + noise + c * 10, 0, 255).astype(np.uint8)
+    frame[:, :, 3] = 255
+    return frame
+
+
+def time_per_frame(func, repeat):
+    """返回单次调用的中位耗时（毫秒）"""
+    func()  # 预热
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def baseline(rgb):
+    """原实现：全分辨率RGB上两次遍历"""
+    return np.mean(rgb), np.std(rgb)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='帧统计微基准')
+    parser.add_argument('--repeat', type=int, default=20, help='每项重复次数')
+    args = parser.parse_args()
+
+    print("=" * 64)
+    print("帧统计微基准（单帧中位耗时，毫秒）")
+    print("=" * 64)
+    print(f"{'分辨率':<8}{'mean+std':>12}{'直方图(全图)':>14}{'加速':>8}"
+          f"{'金字塔+直方图':>16}{'加速':>8}")
+
+    for name, (width, height) in RESOLUTIONS.items():
+        rgba = make_frame(width, height)
+        rgb = rgba[:, :, :3]
+
+        t_base = time_per_frame(lambda: baseline(rgb), args.repeat)
+        t_hist = time_per_frame(lambda: frame_stats(rgb), args.repeat)
+        t_pyr = time_per_frame(
+            lambda: luma_stats(FramePyramid(rgb, rgba=rgba).luma),
+            args.repeat
+        )
+
+        print(f"{name:<10}{t_base:>12.2f}{t_hist:>14.2f}{t_base / t_hist:>9.1f}x"
+              f"{t_pyr:>16.2f}{t_base / t_pyr:>9.1f}x")
+
+    print("=" * 64)
+
+
+if __name__ == "__main__":
+    main()
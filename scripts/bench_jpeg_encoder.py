@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+上传图片编码基准 - 对比原压缩方式与按预算编码的耗时和体积
+
+原方式：LANCZOS 缩放到1024 + 固定质量85，不检查体积
+新方式：JpegEncoder（reduce预缩小 + 双线性 + 质量二分查找）
+
+最后用纯噪声（不可压缩）画面检查输出不超过预算，超出时以退出码1结束。
+
+用法：python scripts/bench_jpeg_encoder.py [--budget 500] [--repeat 5]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ai.jpeg_encoder import JpegEncoder
+
+INPUTS = {
+    '预览 1280x720': (1280, 720),
+    '预览 1920x1080': (1920, 1080),
+    '拍摄 4000x3000': (4000, 3000),
+}
+
+
+def make_frame(width, height, seed=0):
+    """生成带纹理和噪声的合成画面（接近真实照片的压缩难度）"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = (127 + 100 * np.sin(x / 97.0) * np.cos(y / 53.0)).astype(np.uint8)
+    frame[:, :, 1] = (x * 255 / width).astype(np.uint8)
+    frame[:, :, 2] = ((x // 13 + y // 17) % 2 * 80 + 60).astype(np.uint8)
+    noise = rng.integers(-12, 12, size=frame.shape, dtype=np.int16)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def check_budget(budgets=(500, 100, 50, 20)):
+    """不可压缩画面在各预算下的输出体积，返回超预算的项"""
+    rng = np.random.default_rng(1)
+    failures = []
+    for width, height in ((1280, 720), (4000, 3000)):
+        frame = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        for budget in budgets:
+            encoder = JpegEncoder(max_size_kb=budget)
+            data = encoder.encode(frame)
+            ok = len(data) <= budget * 1024
+            print(f"噪声 {width}x{height} 预算 {budget}KB -> {len(data) / 1024:.1f}KB "
+                  f"q{encoder.last_quality} 编码{encoder.last_attempts}次"
+                  f"{'' if ok else ' 超预算'}")
+            if not ok:
+                failures.append((width, height, budget, len(data)))
+    return failures
+
+
+def legacy_compress(frame):
+    """原实现"""
+    img = Image.fromarray(frame)
+    if max(img.size) > 1024:
+        img.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def measure(func, repeat):
+    """返回 (中位耗时毫秒, 输出字节数)"""
+    data = func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples)), len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='上传图片编码基准')
+    parser.add_argument('--budget', type=int, default=500, help='体积预算(KB)')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复次数')
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print(f"上传图片编码基准（预算 {args.budget}KB，中位耗时）")
+    print("=" * 72)
+    print(f"{'输入':<18}{'原耗时(ms)':>12}{'原体积(KB)':>12}"
+          f"{'新耗时(ms)':>12}{'新体积(KB)':>12}{'质量':>6}")
+
+    for name, (width, height) in INPUTS.items():
+        frame = make_frame(width, height)
+        encoder = JpegEncoder(max_size_kb=args.budget)
+
+        t_old, size_old = measure(lambda: legacy_compress(frame), args.repeat)
+        t_new, size_new = measure(lambda: encoder.encode(frame), args.repeat)
+
+        over = ' 超预算' if size_old > args.budget * 1024 else ''
+        print(f"{name:<18}{t_old:>12.1f}{size_old / 1024:>12.1f}"
+              f"{t_new:>12.1f}{size_new / 1024:>12.1f}{encoder.last_quality:>6}{over}")
+
+    print("=" * 72)
+
+    failures = check_budget()
+    print("=" * 72)
+    if failures:
+        print(f"{len(failures)} 项超出预算")
+        return 1
+    print("所有不可压缩输入均未超出预算")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+帧处理流水线基准 - 无显示、无GPU环境下逐阶段测量耗时、吞吐和内存
+
+阶段：
+    texture   CameraManager._texture_to_numpy / _texture_to_frame（伪纹理对象）
+              及回放文件读取到池化帧
+    analyze   LocalAnalyzer.analyze_frame（关闭画面变化复用，测最坏情况）
+    overlay   GridOverlay.draw_all（mock GL 后端，主体位置逐帧变化）
+    compress  TencentCloudAPI._compress_image（按字节预算编码）
+    save      PhotoWriter.submit（CameraScreen.save_photo 在UI线程的开销）
+              及写入完成的端到端耗时
+
+用法：
+    python scripts/bench_pipeline.py                       # 运行并打印结果
+    python scripts/bench_pipeline.py --save-baseline b.json
+    python scripts/bench_pipeline.py --baseline b.json --threshold 0.2
+        # 任一阶段 p50 或 p95 比基线慢超过20%时以退出码1结束
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 必须在导入kivy之前设置：不解析命令行、不创建窗口、使用mock GL
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+os.environ.setdefault('KIVY_GL_BACKEND', 'mock')
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from kivy.graphics.cgl import cgl_init
+
+cgl_init()
+
+from kivy.graphics import Canvas
+
+from src.ai.cloud_api import TencentCloudAPI
+from src.ai.local_analyzer import LocalAnalyzer
+from src.camera.camera_manager import CameraManager
+from src.camera.frame_source import FrameRecorder, ReplayFrameSource
+from src.composition.grid_overlay import GridOverlay
+from src.storage.photo_writer import PhotoWriter
+
+RESOLUTIONS = {
+    '480p': (640, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+STAGES = ('texture', 'analyze', 'overlay', 'compress', 'save')
+
+
+class FakeTexture:
+    """伪纹理：提供与Kivy纹理相同的 pixels 和 size"""
+
+    def __init__(self, rgba):
+        self.size = (rgba.shape[1], rgba.shape[0])
+        self.pixels = rgba.tobytes()
+
+
+def make_frames(width, height, count=4, seed=0):
+    """生成几帧内容不同的合成RGBA画面（循环使用，避免结果被缓存）"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    frames = []
+    for i in range(count):
+        frame = np.empty((height, width, 4), dtype=np.uint8)
+        frame[:, :, 0] = ((x + i * 40) * 255 // width).astype(np.uint8)
+        frame[:, :, 1] = (y * 255 // height).astype(np.uint8)
+        frame[:, :, 2] = (((x // 32 + y // 32 + i) % 2) * 120 + 60).astype(np.uint8)
+        noise = rng.integers(0, 24, size=(height, width), dtype=np.uint8)
+        frame[:, :, :3] += noise[:, :, None]
+        frame[:, :, 3] = 255
+        frames.append(frame)
+    return frames
+
+
+def percentiles(samples):
+    """返回 p50/p95/p99（毫秒）和吞吐（次/秒）"""
+    ms = np.array(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'throughput': round(float(1000.0 / ms.mean()), 1) if ms.mean() > 0 else None,
+    }
+
+
+def measure(step, iterations, warmup=3):
+    """逐次计时，另跑一轮 tracemalloc 统计峰值内存（计时轮不开追踪）"""
+    for i in range(warmup):
+        step(i)
+
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        step(i)
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for i in range(min(iterations, 5)):
+        step(i)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = percentiles(samples)
+    result['peak_kb'] = round(peak / 1024, 1)
+    return result
+
+
+class PipelineBench:
+    """按阶段构建被测对象"""
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.config = {
+            'camera': {'frame_pool_size': 3, 'burst_mode': False},
+            'local_analysis': {'change_gating': False, 'model_path': ''},
+            'tencent_cloud': {'cache_enabled': False},
+            'api_usage': {'ledger_path': os.path.join(workdir, 'usage.log')},
+        }
+        self.camera_manager = CameraManager(self.config)
+        self.analyzer = LocalAnalyzer(self.config)
+        self.analyzer.initialize()
+        self.cloud_api = TencentCloudAPI(self.config)
+        self.overlay = GridOverlay(self.config)
+        self.canvas = Canvas()
+
+    def stage_steps(self, stage, frames):
+        """返回 {指标名: step(i)}"""
+        width, height = frames[0].shape[1], frames[0].shape[0]
+        count = len(frames)
+
+        if stage == 'texture':
+            textures = [FakeTexture(f) for f in frames]
+
+            def to_frame(i):
+                self.camera_manager._texture_to_frame(textures[i % count]).release()
+
+            replay_path = os.path.join(self.workdir, f'replay_{width}x{height}.frames')
+            # 队列容纳全部帧，保证回放文件不丢帧
+            recorder = FrameRecorder(replay_path, max_queue=count)
+            for frame in frames:
+                recorder.write(frame)
+            recorder.close()
+            recorder.join()
+            replay = ReplayFrameSource(replay_path)
+            replay.open()
+
+            def replay_to_frame(i):
+                self.camera_manager._pixels_to_frame(replay.read()).release()
+
+            return {
+                'texture_to_numpy': lambda i: self.camera_manager._texture_to_numpy(
+                    textures[i % count]),
+                'texture_to_frame': to_frame,
+                'replay_to_frame': replay_to_frame,
+            }
+
+        if stage == 'analyze':
+            rgb = [np.ascontiguousarray(f[:, :, :3]) for f in frames]
+            return {'analyze_frame': lambda i: self.analyzer.analyze_frame(rgb[i % count])}
+
+        if stage == 'overlay':
+            def draw(i):
+                subject = {
+                    'bbox': (i % 50, 40, width / 4, height / 4),
+                    'center': (i % 50 + width / 8, 40 + height / 8),
+                    'confidence': 0.8,
+                }
+                self.overlay.draw_all(self.canvas, width, height, subject)
+
+            return {
+                'draw_all_static': lambda i: self.overlay.draw_all(self.canvas, width, height),
+                'draw_all_moving': draw,
+            }
+
+        if stage == 'compress':
+            rgb = [np.ascontiguousarray(f[:, :, :3]) for f in frames]
+            return {'compress_image': lambda i: self.cloud_api._compress_image(rgb[i % count])}
+
+        if stage == 'save':
+            rgb = [np.ascontiguousarray(f[:, :, :3]) for f in frames]
+            output_dir = os.path.join(self.workdir, f'photos_{width}x{height}')
+            writer = PhotoWriter(output_dir=output_dir, max_queue=64, idle_timeout=0.5)
+
+            def submit_and_wait(i):
+                writer.submit(rgb[i % count], {'score': 7.0})
+                writer.flush()
+
+            return {
+                'save_submit': lambda i: writer.submit(rgb[i % count], {'score': 7.0}),
+                'save_end_to_end': submit_and_wait,
+            }
+
+        raise ValueError(stage)
+
+
+def run(args):
+    """运行基准，返回结果字典"""
+    workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    try:
+        bench = PipelineBench(workdir)
+        results = {}
+        for name in args.resolutions:
+            width, height = RESOLUTIONS[name]
+            frames = make_frames(width, height)
+            for stage in args.stages:
+                iterations = args.iterations if stage != 'save' else max(5, args.iterations // 4)
+                for metric, step in bench.stage_steps(stage, frames).items():
+                    results[f'{metric}@{name}'] = measure(step, iterations)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results, baseline, threshold, min_delta_ms=0.05):
+    """与基线比较，返回退化项列表（绝对差小于 min_delta_ms 的视为噪声）"""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get('results', {}).get(key)
+        if not base:
+            continue
+        for field in ('p50_ms', 'p95_ms'):
+            if (base[field] > 0
+                    and current[field] > base[field] * (1 + threshold)
+                    and current[field] - base[field] >= min_delta_ms):
+                regressions.append(
+                    f"{key} {field}: {base[field]:.3f} -> {current[field]:.3f}ms "
+                    f"(+{(current[field] / base[field] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='帧处理流水线基准')
+    parser.add_argument('--iterations', type=int, default=40, help='每项计时次数')
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS),
+                        choices=list(RESOLUTIONS), help='测试分辨率')
+    parser.add_argument('--stages', nargs='+', default=list(STAGES),
+                        choices=STAGES, help='测试阶段')
+    parser.add_argument('--save-baseline', metavar='PATH', help='把结果保存为基线JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='与基线JSON比较')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='允许的退化比例（默认0.2即20%%）')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help='小于该绝对差的变化视为噪声')
+    args = parser.parse_args()
+
+    results = run(args)
+
+    print("=" * 78)
+    print(f"帧处理流水线基准（每项 {args.iterations} 次，{platform.machine()}）")
+    print("=" * 78)
+    print(f"{'阶段@分辨率':<30}{'p50(ms)':>9}{'p95(ms)':>9}{'p99(ms)':>9}"
+          f"{'吞吐(/s)':>10}{'峰值(KB)':>11}")
+    for key, r in results.items():
+        print(f"{key:<30}{r['p50_ms']:>9.3f}{r['p95_ms']:>9.3f}{r['p99_ms']:>9.3f}"
+              f"{r['throughput']:>10.1f}{r['peak_kb']:>11.1f}")
+    print("=" * 78)
+
+    if args.save_baseline:
+        data = {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'machine': platform.platform(),
+            'python': platform.python_version(),
+            'iterations': args.iterations,
+            'results': results,
+        }
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"性能退化（阈值 {args.threshold * 100:.0f}%）：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"与基线相比无退化（阈值 {args.threshold * 100:.0f}%）")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
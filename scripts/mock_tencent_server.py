@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+本地腾讯云替身服务 - 校验TC3签名并返回模拟的图像质量评估结果
+
+用法：
+    # 启动替身服务，配置中把 endpoint 指向 http://127.0.0.1:8765 并关闭 mock_mode
+    python scripts/mock_tencent_server.py --port 8765
+
+    # 自检：启动服务，用 TencentCloudAPI 发送签名请求，验证签名并统计签名耗时
+    python scripts/mock_tencent_server.py --selftest
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 必须在导入kivy之前设置：不解析命令行（--port/--selftest 留给本脚本）
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# 只用于自检中统计客户端派生密钥的耗时；服务端校验不依赖客户端实现
+from src.ai.tc3_signer import derive_signing_key
+
+ALGORITHM = 'TC3-HMAC-SHA256'
+SECRET_ID = 'AKIDLOCALTEST'
+SECRET_KEY = 'local-test-secret'
+SERVICE = 'tiia'
+
+
+def _hmac_sha256(key, message):
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+
+def tc3_signature(secret_key, date, service, string_to_sign):
+    """按腾讯云文档的四步HMAC计算签名（与客户端实现相互独立）"""
+    secret_date = _hmac_sha256(('TC3' + secret_key).encode('utf-8'), date)
+    secret_service = _hmac_sha256(secret_date, service)
+    secret_signing = _hmac_sha256(secret_service, 'tc3_request')
+    return hmac.new(
+        secret_signing, string_to_sign.encode('utf-8'), hashlib.sha256
+    ).hexdigest()
+
+
+def verify_signature(headers, body, secret_key, service):
+    """按TC3规则独立重算签名（每次完整派生密钥），返回错误信息或None"""
+    authorization = headers.get('Authorization', '')
+    if not authorization.startswith(ALGORITHM + ' '):
+        return '缺少TC3签名'
+
+    fields = dict(
+        item.strip().split('=', 1)
+        for item in authorization[len(ALGORITHM) + 1:].split(',')
+    )
+    credential = fields.get('Credential', '').split('/')
+    if len(credential) != 4 or credential[0] != SECRET_ID:
+        return 'Credential无效'
+
+    _, date, credential_service, _ = credential
+    timestamp = headers.get('X-TC-Timestamp', '')
+    signed_headers = fields.get('SignedHeaders', '')
+    canonical_headers = ''.join(
+        f"{name}:{headers.get(name, '').strip()}\n"
+        for name in signed_headers.split(';')
+    )
+    canonical_request = (
+        f'POST\n/\n\n{canonical_headers}\n{signed_headers}\n'
+        f'{hashlib.sha256(body).hexdigest()}'
+    )
+    string_to_sign = (
+        f'{ALGORITHM}\n{timestamp}\n{date}/{credential_service}/tc3_request\n'
+        f'{hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()}'
+    )
+    expected = tc3_signature(secret_key, date, service, string_to_sign)
+    if not hmac.compare_digest(expected, fields.get('Signature', '')):
+        return '签名不匹配'
+    return None
+
+
+class TencentStandInHandler(BaseHTTPRequestHandler):
+    """替身接口：签名正确返回评分，否则返回 AuthFailure"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        error = verify_signature(self.headers, body, SECRET_KEY, SERVICE)
+        self.server.requests += 1
+
+        if error:
+            self.server.rejected += 1
+            response = {'Response': {
+                'Error': {'Code': 'AuthFailure.SignatureFailure', 'Message': error},
+                'RequestId': 'local',
+            }}
+        else:
+            payload = json.loads(body)
+            response = {'Response': {
+                'AestheticScore': 72,
+                'ClarityScore': 80,
+                'SmallImage': len(payload.get('ImageBase64', '')) < 1000,
+                'BlackAndWhite': False,
+                'PureImage': False,
+                'RequestId': 'local',
+            }}
+
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port):
+    """启动替身服务（后台线程）"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), TencentStandInHandler)
+    server.requests = 0
+    server.rejected = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def selftest():
+    """用真实客户端代码发送签名请求并验证"""
+    import numpy as np
+    from src.ai.cloud_api import TencentCloudAPI
+
+    server = start_server(0)
+    ledger_dir = tempfile.mkdtemp(prefix='aic_ledger_')
+    config = {'tencent_cloud': {
+        'enabled': True,
+        'mock_mode': False,
+        'api_key': SECRET_ID,
+        'api_secret': SECRET_KEY,
+        'endpoint': f'http://127.0.0.1:{server.server_port}',
+        'service': SERVICE,
+        'cache_enabled': False,
+        'max_retries': 0,
+    }, 'api_usage': {
+        'ledger_path': os.path.join(ledger_dir, 'good.log'),
+    }}
+    api = TencentCloudAPI(config)
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(720, 1280, 3), dtype=np.uint8)
+
+    print("=" * 50)
+    print("TC3签名自检")
+    print("=" * 50)
+
+    ok = True
+    result = api.analyze_image(frame)
+    print(f"正确签名: {'通过' if result else '失败'} {result}")
+    ok = ok and result is not None
+
+    bad = TencentCloudAPI({
+        'tencent_cloud': dict(config['tencent_cloud'], api_secret='wrong'),
+        'api_usage': {'ledger_path': os.path.join(ledger_dir, 'bad.log')},
+    })
+    rejected = bad.analyze_image(frame) is None
+    print(f"错误密钥被拒绝: {'通过' if rejected else '失败'}")
+    ok = ok and rejected
+
+    # 返回 Response.Error 的请求不计入用量
+    counted = api.ledger.current == 1 and bad.ledger.current == 0
+    print(f"用量计数: {'通过' if counted else '失败'} "
+          f"（成功 {api.ledger.current}，被拒 {bad.ledger.current}）")
+    ok = ok and counted
+
+    # 签名开销与编码开销对比
+    compressed = api._compress_image(frame)
+    body = api._build_body(api._encode_image(compressed))
+
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        api.signer.sign(api.action, body)
+    sign_ms = (time.perf_counter() - start) * 1000 / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        derive_signing_key(SECRET_KEY, '2024-01-01', SERVICE)
+    derive_ms = (time.perf_counter() - start) * 1000 / rounds
+
+    start = time.perf_counter()
+    for _ in range(10):
+        api._compress_image(frame)
+    encode_ms = (time.perf_counter() - start) * 1000 / 10
+
+    print(f"请求体 {len(body) / 1024:.1f}KB")
+    print(f"签名耗时 {sign_ms:.3f}ms（密钥派生缓存，共派生 {api.signer.key_derivations} 次）")
+    print(f"完整密钥派生 {derive_ms:.3f}ms")
+    print(f"JPEG编码耗时 {encode_ms:.1f}ms，签名占比 {sign_ms / encode_ms * 100:.2f}%")
+    print(f"替身服务收到 {server.requests} 个请求，拒绝 {server.rejected} 个")
+    print("=" * 50)
+
+    server.shutdown()
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地腾讯云替身服务')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--selftest', action='store_true', help='运行签名自检')
+    args = parser.parse_args()
+
+    if args.selftest:
+        return selftest()
+
+    server = start_server(args.port)
+    print(f"替身服务已启动: http://127.0.0.1:{args.port}")
+    print(f"SecretId: {SECRET_ID}  SecretKey: {SECRET_KEY}  service: {SERVICE}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+分析工作线程模块 - 在后台线程中运行本地分析，避免阻塞UI
+"""
+
+import threading
+import time
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from src.diagnostics import metrics, tracing
+
+
+def _release(frame):
+    """归还池化帧（普通numpy数组无需处理）"""
+    release = getattr(frame, 'release', None)
+    if release is not None:
+        release()
+
+
+class FrameMailbox:
+    """单槽信箱 - 新帧覆盖尚未处理的旧帧（最新帧优先）"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self._closed = False
+
+        # 统计
+        self.dropped = 0
+
+    def put(self, item):
+        """放入一帧，返回被覆盖的旧帧（没有则返回None）"""
+        with self._condition:
+            stale = self._item
+            if stale is not None:
+                self.dropped += 1
+            self._item = item
+            self._condition.notify()
+        return stale
+
+    def take(self, timeout=None):
+        """取出一帧，信箱为空时阻塞等待；关闭后返回None"""
+        with self._condition:
+            while self._item is None and not self._closed:
+                if not self._condition.wait(timeout):
+                    return None
+            item = self._item
+            self._item = None
+            return item
+
+    def clear(self):
+        """清空信箱，返回未处理的帧"""
+        with self._condition:
+            item = self._item
+            self._item = None
+            return item
+
+    def close(self):
+        """关闭信箱，唤醒等待的线程"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def reopen(self):
+        """重新打开信箱"""
+        with self._condition:
+            self._closed = False
+
+
+class AnalysisWorker:
+    """本地分析工作线程
+
+    UI线程通过 submit() 投递帧，工作线程取出最新一帧调用
+    LocalAnalyzer.analyze_frame()，结果通过 Clock.schedule_once 回到UI线程。
+
+    每次 start() 都使用新的信箱和停止事件。stop() 等待超时时旧线程
+    可能还在分析，它只会看到自己的停止事件，不会和新线程争抢帧，
+    结果也不再回调。
+    """
+
+    def __init__(self, analyzer, result_callback=None):
+        self.analyzer = analyzer
+        self.result_callback = result_callback
+        # 分析耗时回调 latency_callback(seconds)，在工作线程调用
+        self.latency_callback = None
+        # 正在回调的结果对应的帧号（UI线程，追踪时标记界面更新属于哪一帧）
+        self.delivered_frame_id = None
+        self.mailbox = FrameMailbox()
+        self._thread = None
+        self._running = False
+        self._stop_event = None
+
+        # 统计
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self._dropped_before = 0
+
+        # 性能指标
+        self._frames_metric = metrics.counter('analysis.frames')
+        self._dropped_metric = metrics.counter('analysis.dropped')
+        self._failed_metric = metrics.counter('analysis.failed')
+        self._latency_metric = metrics.histogram('analysis.latency_ms')
+
+    @property
+    def dropped(self):
+        """被新帧覆盖而未分析的帧数"""
+        return self._dropped_before + self.mailbox.dropped
+
+    def start(self):
+        """启动工作线程"""
+        if self._running:
+            return
+
+        self._running = True
+        self._dropped_before += self.mailbox.dropped
+        self.mailbox = FrameMailbox()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(self.mailbox, self._stop_event),
+            name='AnalysisWorker',
+            daemon=True
+        )
+        self._thread.start()
+        Logger.info("AnalysisWorker: 分析线程已启动")
+
+    def stop(self, timeout=1.0):
+        """停止工作线程，丢弃未处理的帧"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._stop_event.set()
+        self.mailbox.close()
+        _release(self.mailbox.clear())
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                Logger.warning("AnalysisWorker: 分析线程仍在处理当前帧，结果将被丢弃")
+            self._thread = None
+        Logger.info(
+            f"AnalysisWorker: 分析线程已停止，已处理 {self.processed} 帧，"
+            f"丢弃 {self.dropped} 帧"
+        )
+
+    def submit(self, frame):
+        """投递一帧（UI线程调用，不阻塞）
+
+        帧的所有权交给工作线程，分析完成或被覆盖后自动释放。
+        """
+        if not self._running:
+            _release(frame)
+            return False
+
+        self.submitted += 1
+        stale = self.mailbox.put(frame)
+        if stale is not None:
+            self._dropped_metric.inc()
+            _release(stale)
+        return True
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'submitted': self.submitted,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def _run(self, mailbox, stop_event):
+        """工作线程主循环（只看自己的信箱和停止事件）"""
+        while not stop_event.is_set():
+            frame = mailbox.take()
+            if frame is None:
+                continue
+
+            start = time.perf_counter()
+            frame_id = getattr(frame, 'frame_id', None)
+            try:
+                result = self.analyzer.analyze_frame(frame)
+            except Exception as e:
+                self.failed += 1
+                self._failed_metric.inc()
+                Logger.error(f"AnalysisWorker: 分析失败: {e}")
+                continue
+            finally:
+                _release(frame)
+
+            elapsed = time.perf_counter() - start
+            self.processed += 1
+            self._frames_metric.inc()
+            self._latency_metric.observe(elapsed * 1000)
+            if self.latency_callback:
+                self.latency_callback(elapsed)
+
+            if result is not None and self.result_callback and not stop_event.is_set():
+                self._dispatch(result, frame_id, stop_event)
+
+    def _dispatch(self, result, frame_id=None, stop_event=None):
+        """将结果投递回UI线程（回调前已停止则丢弃）"""
+        callback = self.result_callback
+
+        def deliver(dt):
+            if stop_event is not None and stop_event.is_set():
+                return
+            self.delivered_frame_id = frame_id
+            callback(result)
+
+        Clock.schedule_once(deliver, 0)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+画面变化检测模块 - 画面基本不变时复用上一次的分析结果
+"""
+
+import numpy as np
+
+from src.ai.frame_pyramid import box_downsample
+
+
+class SceneChangeDetector:
+    """画面变化检测器
+
+    用金字塔亮度平面降采样得到约32列的小签名，与上一次真正分析
+    过的帧比较平均绝对差。差值低于阈值视为画面未变化（命中），
+    连续命中超过 max_reuse 次时强制重新分析一次。
+    """
+
+    SIGNATURE_WIDTH = 32
+
+    def __init__(self, threshold=3.0, max_reuse=10):
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self._reference = None
+        self._reuse_count = 0
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """命中率（复用结果的帧占比）"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def signature(self, pyramid):
+        """计算画面签名"""
+        luma = pyramid.luma
+        factor = max(1, luma.shape[1] // self.SIGNATURE_WIDTH)
+        return box_downsample(luma, factor).astype(np.int16)
+
+    def difference(self, signature):
+        """与参考签名的平均绝对差，没有可比较的参考时返回None"""
+        reference = self._reference
+        if reference is None or reference.shape != signature.shape:
+            return None
+        return float(np.abs(signature - reference).mean())
+
+    def check(self, signature):
+        """判断画面是否未变化，True 表示可以复用上一次结果"""
+        diff = self.difference(signature)
+        if (diff is not None and diff < self.threshold
+                and self._reuse_count < self.max_reuse):
+            self._reuse_count += 1
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        return False
+
+    def update(self, signature):
+        """记录刚完成分析的帧签名"""
+        self._reference = signature
+        self._reuse_count = 0
+
+    def reset(self):
+        """清除参考签名"""
+        self._reference = None
+        self._reuse_count = 0
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+        }
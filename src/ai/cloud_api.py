@@ -4,12 +4,20 @@
 """
 
 import base64
-import json
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from kivy.logger import Logger
-from PIL import Image
-import io
-import numpy as np
+
+from src.ai.image_hash import dhash
+from src.ai.jpeg_encoder import JpegEncoder
+from src.ai.result_cache import CloudResultCache
+from src.ai.tc3_signer import TC3Signer
+from src.ai.usage_ledger import UsageLedger
+from src.config_store import watch
+from src.diagnostics import metrics, tracing
 
 
 class TencentCloudAPI:
@@ -20,60 +28,169 @@ class TencentCloudAPI:
         self.api_key = self.config.get('api_key', '')
         self.api_secret = self.config.get('api_secret', '')
         self.endpoint = self.config.get('endpoint', '')
-        self.enabled = self.config.get('enabled', False)
+        
+        # 设置页的开关即时生效
+        watch(config, 'tencent_cloud', 'enabled', self._set_enabled, False)
+        
+        # 模拟模式下不发起网络请求，返回模拟结果
+        self.mock_mode = self.config.get('mock_mode', True)
+        
+        # TC3-HMAC-SHA256 签名（图像质量评估接口）
+        self.action = self.config.get('action', 'AssessQuality')
+        self.signer = TC3Signer(
+            self.api_key,
+            self.api_secret,
+            self.endpoint,
+            service=self.config.get('service') or None,
+            version=self.config.get('version', '2019-05-29'),
+            region=self.config.get('region', '')
+        )
+        watch(config, 'tencent_cloud', 'api_key', self._set_api_key, '')
+        
+        # 超时和重试
+        self.connect_timeout = self.config.get('connect_timeout', 3.0)
+        self.read_timeout = self.config.get('read_timeout', 10.0)
+        self.max_retries = self.config.get('max_retries', 2)
+        self.retry_backoff = self.config.get('retry_backoff', 0.5)
+        
+        # 上传图片编码器（按字节预算压缩）
+        self.upload_max_kb = self.config.get('upload_max_kb', 500)
+        self.encoder = JpegEncoder(
+            max_dimension=self.config.get('upload_max_dimension', 1024),
+            max_size_kb=self.upload_max_kb
+        )
+        
+        # 相似画面的结果缓存
+        self.cache = None
+        if self.config.get('cache_enabled', True):
+            self.cache = CloudResultCache(
+                max_entries=self.config.get('cache_max_entries', 32),
+                ttl=self.config.get('cache_ttl', 600),
+                max_distance=self.config.get('cache_max_distance', 6),
+                path=self.config.get('cache_path', '')
+            )
+        
+        # API用量账本（api_usage 为顶层配置项）
+        usage = config.get('api_usage', {})
+        self.ledger = UsageLedger(
+            usage.get('ledger_path', 'data/api_usage.log'),
+            monthly_limit=usage.get('monthly_limit', 10000),
+            reset_date=usage.get('reset_date', ''),
+            flush_every=usage.get('flush_every', 16),
+            flush_interval=usage.get('flush_interval', 5.0)
+        )
+        
+        # 持久会话，复用keep-alive连接
+        self._session = None
+        self._session_lock = threading.Lock()
+        
+        # 性能指标
+        self._rtt_metric = metrics.histogram('cloud.rtt_ms')
+        self._error_metric = metrics.counter('cloud.errors')
+        self._cache_hit_metric = metrics.counter('cloud.cache_hits')
         
         Logger.info(f"TencentCloudAPI: 初始化，启用状态: {self.enabled}")
     
+    @property
+    def session(self):
+        """懒加载的HTTP会话（多个工作线程共享连接池）"""
+        with self._session_lock:
+            if self._session is None:
+                pool_size = self.config.get('max_workers', 2)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+    
+    def close(self):
+        """关闭HTTP会话并写入未落盘的用量记录"""
+        self.ledger.flush()
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+    
+    def _set_enabled(self, enabled):
+        """启用状态变化"""
+        self.enabled = enabled
+    
+    def _set_api_key(self, api_key):
+        """SecretId变化（签名密钥只依赖SecretKey，缓存无需失效）"""
+        self.api_key = api_key
+        self.signer.secret_id = api_key
+    
     def is_enabled(self):
         """检查是否启用"""
         return self.enabled and self.api_key and self.api_secret
     
-    def analyze_image(self, frame):
-        """分析图像美学质量"""
+    def image_hash(self, frame):
+        """计算画面感知哈希（缓存键）"""
+        return dhash(frame)
+    
+    def lookup_cached(self, frame, image_hash=None):
+        """查找相似画面的缓存结果，不访问网络也不消耗配额"""
+        if self.cache is None:
+            return None
+        if image_hash is None:
+            image_hash = self.image_hash(frame)
+        result = self.cache.lookup(image_hash)
+        if result is not None:
+            self._cache_hit_metric.inc()
+            Logger.info("TencentCloudAPI: 命中结果缓存")
+        return result
+    
+    def analyze_image(self, frame, cancel_event=None, image_hash=None):
+        """分析图像美学质量（阻塞，应在工作线程调用）
+
+        cancel_event 被置位后尽快放弃，返回None。
+        成功的结果按 image_hash（未提供时现算）写入缓存。
+        """
         if not self.is_enabled():
             Logger.warning("TencentCloudAPI: API未启用或未配置")
             return None
         
         try:
+            if self.cache is not None and image_hash is None:
+                image_hash = self.image_hash(frame)
+            
             # 压缩图片
             compressed = self._compress_image(frame)
+            if compressed is None or self._cancelled(cancel_event):
+                return None
             
             # 转换为base64
             image_base64 = self._encode_image(compressed)
+            if image_base64 is None or self._cancelled(cancel_event):
+                return None
             
             # 调用API
-            result = self._call_api(image_base64)
+            result = self._call_api(image_base64, cancel_event)
             
             if result:
                 Logger.info("TencentCloudAPI: 图像分析成功")
-                return self._parse_result(result)
+                parsed = self._parse_result(result)
+                if parsed is not None and self.cache is not None:
+                    self.cache.store(image_hash, parsed)
+                return parsed
             
             return None
         except Exception as e:
             Logger.error(f"TencentCloudAPI: 分析失败: {e}")
             return None
     
-    def _compress_image(self, frame, max_size_kb=500):
-        """压缩图片 - 使用PIL"""
+    def _compress_image(self, frame, max_size_kb=None):
+        """压缩图片 - 按字节预算编码JPEG"""
         try:
-            # 转换为PIL Image
-            if isinstance(frame, np.ndarray):
-                img = Image.fromarray(frame)
-            else:
-                img = frame
-            
-            # 调整大小
-            max_dimension = 1024
-            if max(img.size) > max_dimension:
-                img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
-            
-            # 压缩为JPEG
-            buffer = io.BytesIO()
-            img.save(buffer, format='JPEG', quality=85)
-            compressed_bytes = buffer.getvalue()
+            with tracing.span('cloud.compress'):
+                compressed_bytes = self.encoder.encode(frame, max_size_kb or self.upload_max_kb)
             
             size_kb = len(compressed_bytes) / 1024
-            Logger.info(f"TencentCloudAPI: 图片压缩后大小: {size_kb:.1f}KB")
+            Logger.info(
+                f"TencentCloudAPI: 图片压缩后大小: {size_kb:.1f}KB，"
+                f"质量 {self.encoder.last_quality}"
+            )
             
             return compressed_bytes
         except Exception as e:
@@ -81,200 +198,100 @@ class TencentCloudAPI:
             return None
     
     def _encode_image(self, image_bytes):
-        """编码图片为base64"""
+        """编码图片为base64（ASCII字节，直接拼入请求体）"""
         try:
-            return base64.b64encode(image_bytes).decode('utf-8')
+            return base64.b64encode(image_bytes)
         except Exception as e:
             Logger.error(f"TencentCloudAPI: Base64编码失败: {e}")
             return None
     
-    def _call_api(self, image_base64):
+    def _call_api(self, image_base64, cancel_event=None):
         """调用腾讯云API"""
-        # 注意：这是简化版本，实际需要使用腾讯云SDK进行签名认证
-        # 这里提供接口框架，实际使用时需要完善
-        
         try:
-            # 构建请求
-            payload = {
-                "Image": image_base64,
-                # 其他参数根据腾讯云API文档添加
-            }
+            if self.mock_mode:
+                # 模拟返回（实际使用时关闭 mock_mode）
+                Logger.info("TencentCloudAPI: 调用API（当前为模拟模式）")
+                return self._mock_response()
             
-            headers = {
-                "Content-Type": "application/json",
-                # 添加认证头
-            }
+            # 请求体只序列化一次，签名和发送使用同一份字节
+            body = self._build_body(image_base64)
+            headers = self.signer.sign(self.action, body)
             
-            # 发送请求
-            # response = requests.post(self.endpoint, json=payload, headers=headers, timeout=5)
+            # 发送请求（往返时间包括重试和退避）
+            start = time.perf_counter()
+            with tracing.span('cloud.post'):
+                response = self._post(body, headers, cancel_event)
+            self._rtt_metric.observe((time.perf_counter() - start) * 1000)
+            if response is None:
+                self._error_metric.inc()
+                return None
             
-            # 模拟返回（实际使用时删除）
-            Logger.info("TencentCloudAPI: 调用API（当前为模拟模式）")
-            return self._mock_response()
+            # 服务端已受理的请求计入用量（缓存命中和合并的请求不会走到这里），
+            # 返回 Response.Error 的请求（签名错误、限流等）不计费
+            result = response.json()
+            if not self._response_error(result):
+                self.ledger.record()
+            return result
             
         except Exception as e:
             Logger.error(f"TencentCloudAPI: API调用失败: {e}")
             return None
     
-    def _mock_response(self):
-        """模拟API响应（用于测试）"""
-        return {
-            "AestheticScore": 8.5,
-            "TechnicalScore": 8.2,
-            "Composition": "良好",
-            "ColorBalance": "优秀",
-            "Suggestions": [
-                "主体位置符合黄金分割",
-                "色彩饱和度适中",
-                "建议增加前景元素"
-            ]
-        }
-    
-    def _parse_result(self, result):
-        """解析API返回结果"""
-        try:
-            return {
-                'aesthetic_score': result.get('AestheticScore', 0),
-                'technical_score': result.get('TechnicalScore', 0),
-                'composition': result.get('Composition', ''),
-                'color_balance': result.get('ColorBalance', ''),
-                'suggestions': result.get('Suggestions', []),
-                'overall_rating': self._calculate_rating(result.get('AestheticScore', 0))
-            }
-        except Exception as e:
-            Logger.error(f"TencentCloudAPI: 结果解析失败: {e}")
-            return None
-    
-    def _calculate_rating(self, score):
-        """计算星级评分"""
-        if score >= 9.0:
-            return "⭐⭐⭐⭐⭐"
-        elif score >= 8.0:
-            return "⭐⭐⭐⭐"
-        elif score >= 7.0:
-            return "⭐⭐⭐"
-        elif score >= 6.0:
-            return "⭐⭐"
-        else:
-            return "⭐"
+    @staticmethod
+    def _response_error(result):
+        """返回 Response.Error 信封（没有时返回None）"""
+        response = result.get('Response') if isinstance(result, dict) else None
+        if isinstance(response, dict):
+            return response.get('Error')
+        return None
     
-    def check_quota(self):
-        """检查API配额"""
-        # 从配置读取使用情况
-        usage = self.config.get('api_usage', {})
-        current = usage.get('current_usage', 0)
-        limit = usage.get('monthly_limit', 10000)
-        
-        remaining = limit - current
-        Logger.info(f"TencentCloudAPI: 剩余配额: {remaining}/{limit}")
-        
-        return {
-            'current': current,
-            'limit': limit,
-            'remaining': remaining,
-            'percentage': (current / limit * 100) if limit > 0 else 0
-        }
-    """腾讯云API客户端"""
-    
-    def __init__(self, config):
-        self.config = config.get('tencent_cloud', {})
-        self.api_key = self.config.get('api_key', '')
-        self.api_secret = self.config.get('api_secret', '')
-        self.endpoint = self.config.get('endpoint', '')
-        self.enabled = self.config.get('enabled', False)
-        
-        Logger.info(f"TencentCloudAPI: 初始化，启用状态: {self.enabled}")
-    
-    def is_enabled(self):
-        """检查是否启用"""
-        return self.enabled and self.api_key and self.api_secret
+    @staticmethod
+    def _build_body(image_base64):
+        """构建JSON请求体
+
+        base64字符集不需要JSON转义，直接拼接，避免把几百KB的图片数据
+        再经过 json.dumps 和 encode 复制两次。
+        """
+        return b''.join((b'{"ImageBase64":"', image_base64, b'"}'))
     
-    def analyze_image(self, frame):
-        """分析图像美学质量"""
-        if not self.is_enabled():
-            Logger.warning("TencentCloudAPI: API未启用或未配置")
-            return None
+    def _post(self, body, headers, cancel_event=None):
+        """发送POST请求，超时或服务端错误时按抖动退避重试"""
+        timeout = (self.connect_timeout, self.read_timeout)
         
-        try:
-            # 压缩图片
-            compressed = self._compress_image(frame)
-            
-            # 转换为base64
-            image_base64 = self._encode_image(compressed)
+        for attempt in range(self.max_retries + 1):
+            if self._cancelled(cancel_event):
+                return None
             
-            # 调用API
-            result = self._call_api(image_base64)
+            try:
+                response = self.session.post(
+                    self.endpoint, data=body, headers=headers, timeout=timeout
+                )
+                if response.status_code < 500 and response.status_code != 429:
+                    response.raise_for_status()
+                    return response
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
             
-            if result:
-                Logger.info("TencentCloudAPI: 图像分析成功")
-                return self._parse_result(result)
+            if attempt == self.max_retries:
+                Logger.error(f"TencentCloudAPI: 请求失败，已重试 {attempt} 次: {error}")
+                return None
             
-            return None
-        except Exception as e:
-            Logger.error(f"TencentCloudAPI: 分析失败: {e}")
-            return None
-    
-    def _compress_image(self, frame, max_size_kb=500):
-        """压缩图片"""
-        try:
-            # 调整大小
-            height, width = frame.shape[:2]
-            max_dimension = 1024
-            
-            if max(height, width) > max_dimension:
-                scale = max_dimension / max(height, width)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                frame = cv2.resize(frame, (new_width, new_height))
-            
-            # 压缩质量
-            encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 85]
-            _, encoded = cv2.imencode('.jpg', frame, encode_param)
-            
-            # 检查大小
-            size_kb = len(encoded) / 1024
-            Logger.info(f"TencentCloudAPI: 图片压缩后大小: {size_kb:.1f}KB")
-            
-            return encoded.tobytes()
-        except Exception as e:
-            Logger.error(f"TencentCloudAPI: 图片压缩失败: {e}")
-            return None
-    
-    def _encode_image(self, image_bytes):
-        """编码图片为base64"""
-        try:
-            return base64.b64encode(image_bytes).decode('utf-8')
-        except Exception as e:
-            Logger.error(f"TencentCloudAPI: Base64编码失败: {e}")
-            return None
-    
-    def _call_api(self, image_base64):
-        """调用腾讯云API"""
-        # 注意：这是简化版本，实际需要使用腾讯云SDK进行签名认证
-        # 这里提供接口框架，实际使用时需要完善
+            # 指数退避 + 全抖动，可被取消打断
+            delay = random.uniform(0, self.retry_backoff * (2 ** attempt))
+            Logger.warning(f"TencentCloudAPI: 请求失败（{error}），{delay:.2f}秒后重试")
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    return None
+            else:
+                time.sleep(delay)
         
-        try:
-            # 构建请求
-            payload = {
-                "Image": image_base64,
-                # 其他参数根据腾讯云API文档添加
-            }
-            
-            headers = {
-                "Content-Type": "application/json",
-                # 添加认证头
-            }
-            
-            # 发送请求
-            # response = requests.post(self.endpoint, json=payload, headers=headers, timeout=5)
-            
-            # 模拟返回（实际使用时删除）
-            Logger.info("TencentCloudAPI: 调用API（当前为模拟模式）")
-            return self._mock_response()
-            
-        except Exception as e:
-            Logger.error(f"TencentCloudAPI: API调用失败: {e}")
-            return None
+        return None
+    
+    @staticmethod
+    def _cancelled(cancel_event):
+        """是否已取消"""
+        return cancel_event is not None and cancel_event.is_set()
     
     def _mock_response(self):
         """模拟API响应（用于测试）"""
@@ -293,6 +310,10 @@ class TencentCloudAPI:
     def _parse_result(self, result):
         """解析API返回结果"""
         try:
+            # 腾讯云接口返回 {"Response": {...}}，评分为0-100
+            if 'Response' in result:
+                return self._parse_response(result['Response'])
+            
             return {
                 'aesthetic_score': result.get('AestheticScore', 0),
                 'technical_score': result.get('TechnicalScore', 0),
@@ -305,6 +326,33 @@ class TencentCloudAPI:
             Logger.error(f"TencentCloudAPI: 结果解析失败: {e}")
             return None
     
+    def _parse_response(self, response):
+        """解析腾讯云图像质量评估接口的返回"""
+        error = response.get('Error')
+        if error:
+            Logger.error(
+                f"TencentCloudAPI: 接口返回错误: {error.get('Code')} {error.get('Message')}"
+            )
+            return None
+        
+        aesthetic_score = response.get('AestheticScore', 0) / 10.0
+        suggestions = []
+        if response.get('SmallImage'):
+            suggestions.append("图片尺寸过小")
+        if response.get('BlackAndWhite'):
+            suggestions.append("画面为黑白图像")
+        if response.get('PureImage'):
+            suggestions.append("画面内容单一")
+        
+        return {
+            'aesthetic_score': aesthetic_score,
+            'technical_score': response.get('ClarityScore', 0) / 10.0,
+            'composition': '',
+            'color_balance': '',
+            'suggestions': suggestions,
+            'overall_rating': self._calculate_rating(aesthetic_score)
+        }
+    
     def _calculate_rating(self, score):
         """计算星级评分"""
         if score >= 9.0:
@@ -320,12 +368,10 @@ class TencentCloudAPI:
     
     def check_quota(self):
         """检查API配额"""
-        # 从配置读取使用情况
-        usage = self.config.get('api_usage', {})
-        current = usage.get('current_usage', 0)
-        limit = usage.get('monthly_limit', 10000)
+        current = self.ledger.current
+        limit = self.ledger.monthly_limit
         
-        remaining = limit - current
+        remaining = max(0, limit - current)
         Logger.info(f"TencentCloudAPI: 剩余配额: {remaining}/{limit}")
         
         return {
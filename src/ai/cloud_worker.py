@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+云端分析执行器模块 - 在线程池中调用云端API，结果回到UI线程
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from src.ai.image_hash import hamming_distance
+from src.diagnostics import metrics, tracing
+
+
+class CloudTask:
+    """一次云端分析任务（可能被多次请求共享）"""
+
+    def __init__(self, frame, image_hash=None):
+        self.frame = frame
+        self.image_hash = image_hash
+        self.callbacks = []
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.submitted_at = time.perf_counter()
+        self.latency = None
+
+    @property
+    def cancelled(self):
+        """是否已取消"""
+        return self.cancel_event.is_set()
+
+    def add_callback(self, callback):
+        """登记回调（同一回调只登记一次）"""
+        if callback not in self.callbacks:
+            self.callbacks.append(callback)
+
+    def cancel(self):
+        """取消任务：未开始的直接取消，进行中的尽快放弃，结果不再回调"""
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class CloudAnalysisExecutor:
+    """云端分析执行器
+
+    压缩、编码和网络请求都在工作线程中进行，UI线程只负责提交任务
+    和接收回调。离开相机屏幕时调用 cancel_all() 放弃所有未完成任务。
+
+    重复请求的合并：
+    - 单飞：与进行中或排队中的任务画面哈希相近（汉明距离不超过
+      max_distance）时，不再发起新请求，只登记回调共享结果
+    - 合并排队：工作线程都在忙时，新场景进入单槽队列并替换旧的排队
+      请求，旧请求的回调转给新请求，只上传最新的画面
+    """
+
+    def __init__(self, cloud_api, max_workers=2, max_distance=6):
+        self.cloud_api = cloud_api
+        self.max_workers = max_workers
+        self.max_distance = max_distance
+        self._executor = None
+        self._pending = set()
+        self._queued = None
+        self._active = 0
+        self._lock = threading.Lock()
+
+        # 统计
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.coalesced = 0
+        self.collapsed = 0
+        self.last_latency = None
+
+        # 性能指标
+        self._task_metric = metrics.histogram('cloud.task_ms')
+        self._pending_metric = metrics.gauge('cloud.pending')
+
+    def submit(self, frame, callback, image_hash=None):
+        """提交一次分析，完成后在UI线程调用 callback(result)
+
+        返回负责这次请求的任务，可能是已存在的任务。
+        """
+        with self._lock:
+            self.submitted += 1
+
+            # 相似画面已有请求在途，共享结果
+            task = self._find_similar(image_hash)
+            if task is not None:
+                task.add_callback(callback)
+                self.coalesced += 1
+                return task
+
+            task = CloudTask(frame, image_hash)
+            task.add_callback(callback)
+            self._pending.add(task)
+
+            if self._active < self.max_workers:
+                self._active += 1
+                start = True
+            else:
+                # 线程都在忙，替换排队中的旧请求
+                stale = self._queued
+                if stale is not None:
+                    for stale_callback in stale.callbacks:
+                        task.add_callback(stale_callback)
+                    self._pending.discard(stale)
+                    self.collapsed += 1
+                self._queued = task
+                start = False
+
+            self._pending_metric.set(len(self._pending))
+
+        if start:
+            self._start(task)
+        return task
+
+    def cancel_all(self):
+        """取消所有未完成的任务"""
+        with self._lock:
+            tasks = list(self._pending)
+            self._pending.clear()
+            self._queued = None
+        for task in tasks:
+            task.cancel()
+        self.cancelled += len(tasks)
+        if tasks:
+            Logger.info(f"CloudAnalysisExecutor: 已取消 {len(tasks)} 个云端分析任务")
+
+    def shutdown(self):
+        """取消任务并关闭线程池"""
+        self.cancel_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.cloud_api.close()
+
+    @property
+    def pending_count(self):
+        """未完成的任务数（包括排队中的）"""
+        with self._lock:
+            return len(self._pending)
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'pending': self.pending_count,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'coalesced': self.coalesced,
+            'collapsed': self.collapsed,
+            'last_latency_ms': (self.last_latency * 1000
+                                if self.last_latency is not None else None),
+        }
+
+    def _find_similar(self, image_hash):
+        """查找画面相近的未完成任务（调用方持有锁）"""
+        if image_hash is None:
+            return None
+        for task in self._pending:
+            if (task.image_hash is not None and not task.cancelled
+                    and hamming_distance(task.image_hash, image_hash) <= self.max_distance):
+                return task
+        return None
+
+    def _start(self, task):
+        """把任务交给线程池"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='CloudWorker'
+            )
+        task.future = self._executor.submit(self._run, task)
+        # 完成回调对未开始就被取消的 future 同样触发，名额不会泄漏
+        task.future.add_done_callback(lambda future: self._on_done(task))
+
+    def _run(self, task):
+        """工作线程执行"""
+        if not task.cancelled:
+            with tracing.span('cloud.execute'):
+                self._execute(task)
+
+    def _on_done(self, task):
+        """任务结束（完成、异常或取消）：有排队任务时接着执行，否则释放一个执行名额"""
+        task.frame = None
+        with self._lock:
+            self._pending.discard(task)
+            self._pending_metric.set(len(self._pending))
+            next_task = self._queued
+            self._queued = None
+            if next_task is None:
+                self._active -= 1
+        if next_task is not None:
+            self._start(next_task)
+
+    def _execute(self, task):
+        """调用云端API并投递结果"""
+        result = self.cloud_api.analyze_image(
+            task.frame, task.cancel_event, task.image_hash
+        )
+        task.frame = None
+        task.latency = time.perf_counter() - task.submitted_at
+
+        with self._lock:
+            self._pending.discard(task)
+            self._pending_metric.set(len(self._pending))
+
+        if task.cancelled:
+            return
+
+        self.last_latency = task.latency
+        self._task_metric.observe(task.latency * 1000)
+        if result is None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+        Clock.schedule_once(lambda dt: self._deliver(task, result), 0)
+
+    def _deliver(self, task, result):
+        """UI线程回调（期间被取消则丢弃）"""
+        if task.cancelled:
+            return
+        for callback in task.callbacks:
+            callback(result)
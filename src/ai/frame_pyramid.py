@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+帧金字塔模块 - 每帧构建一次多分辨率代理图，供所有分析器共享
+"""
+
+import numpy as np
+
+from src.camera.frame_pool import rgb_to_luma
+
+
+def box_downsample(image, factor):
+    """整数盒式降采样（向量化，按 factor x factor 块求均值）
+
+    先把每 factor 行累加，再把每 factor 列累加，每一步都是对整块
+    内存的向量加法。尺寸不能整除时裁掉右侧和底部不足一块的像素。
+    """
+    height, width = image.shape[:2]
+    out_h = height // factor
+    out_w = width // factor
+    if out_h == 0 or out_w == 0:
+        return np.ascontiguousarray(image)
+
+    cropped = image[:out_h * factor, :out_w * factor]
+
+    # 16x16以内的块和用uint16足够
+    acc_dtype = np.uint16 if factor * factor <= 256 else np.uint32
+
+    rows = cropped[0::factor].astype(acc_dtype)
+    for i in range(1, factor):
+        rows += cropped[i::factor]
+
+    sums = rows[:, 0::factor].copy()
+    for i in range(1, factor):
+        sums += rows[:, i::factor]
+
+    sums += (factor * factor) // 2
+    sums //= factor * factor
+    return sums.astype(np.uint8)
+
+
+class FramePyramid:
+    """帧金字塔
+
+    full       - 原始分辨率RGB（视图，不复制，池化帧释放后失效）
+    quarter    - 1/4 分辨率RGB（宽高各缩小4倍）
+    sixteenth  - 1/16 分辨率RGB（宽高各缩小16倍）
+    proxy      - quarter/sixteenth 中宽度最接近 proxy_width 的一层
+    luma       - proxy 层的亮度平面
+
+    分析器统一从金字塔取所需的层级，降采样只在构建时做一次，
+    预览分辨率提高时代理层尺寸基本不变。
+    """
+
+    LEVEL_FACTORS = {'full': 1, 'quarter': 4, 'sixteenth': 16}
+
+    def __init__(self, rgb, proxy_width=320, rgba=None):
+        self.full = rgb
+
+        # 有RGBA缓冲区时在连续内存上降采样，再取RGB视图
+        source = rgba if rgba is not None else rgb
+        quarter = box_downsample(source, 4)
+        sixteenth = box_downsample(quarter, 4)
+        self.quarter = quarter[:, :, :3]
+        self.sixteenth = sixteenth[:, :, :3]
+
+        self.proxy_level = self._select_proxy_level(proxy_width)
+        self.proxy = getattr(self, self.proxy_level)
+        self.luma = rgb_to_luma(self.proxy)
+
+    @classmethod
+    def from_frame(cls, frame, proxy_width=320):
+        """从池化帧或RGB数组构建金字塔"""
+        if isinstance(frame, cls):
+            return frame
+        if hasattr(frame, 'rgba'):
+            return cls(frame.rgb, proxy_width=proxy_width, rgba=frame.rgba)
+        return cls(frame, proxy_width=proxy_width)
+
+    @property
+    def width(self):
+        """原始宽度"""
+        return self.full.shape[1]
+
+    @property
+    def height(self):
+        """原始高度"""
+        return self.full.shape[0]
+
+    def level(self, name):
+        """按名称获取层级"""
+        return getattr(self, name)
+
+    def scale(self, level_name):
+        """层级相对原图的缩放倍数（宽高方向）"""
+        return self.LEVEL_FACTORS[level_name]
+
+    def _select_proxy_level(self, proxy_width):
+        """选择宽度最接近目标的代理层"""
+        candidates = ('quarter', 'sixteenth')
+        return min(
+            candidates,
+            key=lambda name: abs(getattr(self, name).shape[1] - proxy_width)
+        )
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+帧统计模块 - 基于亮度直方图一次性计算曝光统计量
+"""
+
+import numpy as np
+
+from src.camera.frame_pool import rgb_to_luma
+
+
+# 直方图灰阶及其平方，计算均值/方差时复用
+_LEVELS = np.arange(256, dtype=np.float64)
+_LEVELS_SQ = _LEVELS * _LEVELS
+
+# 默认阴影/高光裁切阈值（亮度值）
+SHADOW_LEVEL = 8
+HIGHLIGHT_LEVEL = 247
+
+
+def luma_histogram(luma):
+    """计算256级亮度直方图"""
+    return np.bincount(luma.reshape(-1), minlength=256)
+
+
+def histogram_stats(hist, shadow_level=SHADOW_LEVEL, highlight_level=HIGHLIGHT_LEVEL):
+    """从直方图推导曝光统计量
+
+    均值、标准差、百分位、阴影/高光裁切比例和动态范围都只需要
+    256个bin的运算，与画面尺寸无关。
+    """
+    total = int(hist.sum())
+    if total == 0:
+        return None
+
+    weights = hist.astype(np.float64)
+    mean = float(weights @ _LEVELS) / total
+    variance = float(weights @ _LEVELS_SQ) / total - mean * mean
+    std = float(np.sqrt(max(variance, 0.0)))
+
+    # 累计分布，百分位用二分查找
+    cdf = np.cumsum(hist)
+    p1, p5, p50, p95, p99 = np.searchsorted(
+        cdf, np.array([0.01, 0.05, 0.5, 0.95, 0.99]) * total
+    ).tolist()
+
+    shadow_clip = float(cdf[shadow_level]) / total
+    highlight_clip = float(total - cdf[highlight_level - 1]) / total
+
+    return {
+        'mean': mean,
+        'std': std,
+        'p1': p1,
+        'p5': p5,
+        'median': p50,
+        'p95': p95,
+        'p99': p99,
+        'shadow_clip': shadow_clip,
+        'highlight_clip': highlight_clip,
+        'dynamic_range': p99 - p1,
+        'pixel_count': total,
+    }
+
+
+def luma_stats(luma, shadow_level=SHADOW_LEVEL, highlight_level=HIGHLIGHT_LEVEL):
+    """亮度平面的统计量"""
+    return histogram_stats(luma_histogram(luma), shadow_level, highlight_level)
+
+
+def frame_stats(rgb, shadow_level=SHADOW_LEVEL, highlight_level=HIGHLIGHT_LEVEL):
+    """RGB画面的统计量（整数权重计算亮度后统计）"""
+    return luma_stats(rgb_to_luma(rgb), shadow_level, highlight_level)
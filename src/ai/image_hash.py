@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+感知哈希模块 - 为画面计算64位差值哈希（dHash），用于识别相似画面
+"""
+
+import numpy as np
+
+from src.camera.frame_pool import rgb_to_luma
+
+
+HASH_WIDTH = 8
+HASH_HEIGHT = 8
+# 每个哈希格子采样 SAMPLES x SAMPLES 个像素后求均值
+SAMPLES = 4
+
+
+def dhash(frame):
+    """计算64位差值哈希
+
+    只按固定网格稀疏采样约 32x36 个像素，开销与画面分辨率无关。
+    frame 可以是RGB数组或池化帧。
+    """
+    rgb = frame.rgb if hasattr(frame, 'rgb') else frame
+    height, width = rgb.shape[:2]
+
+    rows = np.linspace(0, height - 1, HASH_HEIGHT * SAMPLES).astype(np.intp)
+    cols = np.linspace(0, width - 1, (HASH_WIDTH + 1) * SAMPLES).astype(np.intp)
+    sample = rgb[rows][:, cols]
+
+    luma = rgb_to_luma(sample).astype(np.uint16)
+    grid = luma.reshape(HASH_HEIGHT, SAMPLES, HASH_WIDTH + 1, SAMPLES).sum(axis=(1, 3))
+
+    bits = (grid[:, 1:] > grid[:, :-1]).reshape(-1)
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming_distance(hash_a, hash_b):
+    """两个哈希之间不同的位数"""
+    return bin(hash_a ^ hash_b).count('1')
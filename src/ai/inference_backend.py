@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+推理后端模块 - 加载NIMA美学评分模型，支持TFLite/ONNX/纯NumPy
+"""
+
+import os
+import threading
+
+from kivy.logger import Logger
+import numpy as np
+
+
+class InferenceBackend:
+    """推理后端基类
+
+    模型只加载一次，输入张量和缩放用的中间缓冲区预先分配，
+    每帧只做最近邻缩放、归一化和一次推理。子类实现 _load() 和 _run()。
+    预分配的缓冲区和解释器不能并发使用，推理调用之间用锁串行。
+    """
+
+    name = 'base'
+
+    def __init__(self, model_path, num_threads=2, batch_size=4):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.batch_size = max(1, batch_size)
+        self.input_size = (224, 224)  # (高, 宽)
+        self.input_dtype = np.float32
+        # MobileNet预处理：[0, 255] -> [-1, 1]
+        self.input_scale = 1.0 / 127.5
+        self.input_offset = -1.0
+        self.loaded = False
+
+        self._input = None
+        self._batch_input = None
+        self._resized = None
+        self._index_cache = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """加载模型并预分配输入张量"""
+        try:
+            self._load()
+            height, width = self.input_size
+            self._input = np.zeros((1, height, width, 3), dtype=self.input_dtype)
+            self._batch_input = np.zeros(
+                (self.batch_size, height, width, 3), dtype=self.input_dtype
+            )
+            self._resized = np.empty((height, width, 3), dtype=np.uint8)
+            self.loaded = True
+            Logger.info(
+                f"InferenceBackend: {self.name} 模型加载成功: {self.model_path}，"
+                f"输入 {width}x{height}，线程数 {self.num_threads}"
+            )
+            return True
+        except Exception as e:
+            Logger.error(f"InferenceBackend: {self.name} 模型加载失败: {e}")
+            return False
+
+    def predict(self, image):
+        """对RGB图像评分，返回 0-10 分"""
+        if not self.loaded:
+            return None
+
+        with self._lock:
+            self._prepare(image, self._input[0])
+            distribution = self._run(self._input)
+            return self._distribution_to_score(distribution[0])
+
+    def predict_batch(self, images):
+        """批量评分，按 batch_size 分组，每组只推理一次"""
+        if not self.loaded:
+            return [None] * len(images)
+
+        scores = []
+        with self._lock:
+            for start in range(0, len(images), self.batch_size):
+                chunk = images[start:start + self.batch_size]
+                batch = self._batch_input[:len(chunk)]
+                for i, image in enumerate(chunk):
+                    self._prepare(image, batch[i])
+                distributions = self._run_batch(batch)
+                scores.extend(self._distribution_to_score(d) for d in distributions)
+        return scores
+
+    def _prepare(self, image, out):
+        """最近邻缩放并归一化到预分配的输入张量"""
+        rows, cols, row_buffer = self._resize_plan(image.shape[:2])
+        np.take(image[:, :, :3], rows, axis=0, out=row_buffer)
+        np.take(row_buffer, cols, axis=1, out=self._resized)
+
+        if self.input_dtype == np.uint8:
+            # 量化模型直接输入原始像素
+            np.copyto(out, self._resized)
+        else:
+            np.multiply(self._resized, self.input_scale, out=out)
+            out += self.input_offset
+
+    def _resize_plan(self, source_shape):
+        """缓存每种输入尺寸的采样索引和行缓冲区"""
+        plan = self._index_cache.get(source_shape)
+        if plan is None:
+            src_h, src_w = source_shape
+            height, width = self.input_size
+            rows = (np.arange(height) * src_h // height).astype(np.intp)
+            cols = (np.arange(width) * src_w // width).astype(np.intp)
+            row_buffer = np.empty((height, src_w, 3), dtype=np.uint8)
+            plan = (rows, cols, row_buffer)
+            self._index_cache[source_shape] = plan
+        return plan
+
+    @staticmethod
+    def _distribution_to_score(distribution):
+        """NIMA输出10档评分分布，取期望值"""
+        distribution = np.asarray(distribution, dtype=np.float64).reshape(-1)
+        if distribution.size == 1:
+            return float(distribution[0])
+        total = distribution.sum()
+        if total <= 0:
+            return None
+        levels = np.arange(1, distribution.size + 1)
+        return float(distribution @ levels / total)
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _run(self, input_tensor):
+        raise NotImplementedError
+
+    def _run_batch(self, batch):
+        """批量推理，默认直接把整批输入交给 _run()"""
+        return self._run(batch)
+
+
+class TFLiteBackend(InferenceBackend):
+    """TensorFlow Lite 后端（优先使用 tflite_runtime）
+
+    单帧和批量各用一个解释器，张量形状在加载时固定，推理时不再
+    resize_tensor_input / allocate_tensors。不满一批时补零到整批。
+    """
+
+    name = 'tflite'
+
+    def _load(self):
+        self.interpreter = self._create_interpreter(1)
+
+        input_detail = self.interpreter.get_input_details()[0]
+        self._input_index = input_detail['index']
+        self._output_index = self.interpreter.get_output_details()[0]['index']
+        _, height, width, _ = input_detail['shape']
+        self.input_size = (int(height), int(width))
+        self.input_dtype = input_detail['dtype']
+
+        self.batch_interpreter = None
+        if self.batch_size > 1:
+            self.batch_interpreter = self._create_interpreter(self.batch_size)
+
+    def _create_interpreter(self, batch):
+        """创建解释器并按批大小一次性分配张量"""
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        interpreter = Interpreter(
+            model_path=self.model_path,
+            num_threads=self.num_threads
+        )
+        if batch > 1:
+            input_detail = interpreter.get_input_details()[0]
+            _, height, width, channels = input_detail['shape']
+            interpreter.resize_tensor_input(
+                input_detail['index'], [batch, int(height), int(width), int(channels)]
+            )
+        interpreter.allocate_tensors()
+        return interpreter
+
+    def _run(self, input_tensor):
+        return self._invoke(self.interpreter, input_tensor)
+
+    def _run_batch(self, batch):
+        count = len(batch)
+        if self.batch_interpreter is None or count == 1:
+            return np.concatenate([self._run(batch[i:i + 1]) for i in range(count)])
+
+        # batch 是 _batch_input 的前 count 行，其余行补零后整批推理
+        self._batch_input[count:] = 0
+        return self._invoke(self.batch_interpreter, self._batch_input)[:count]
+
+    def _invoke(self, interpreter, input_tensor):
+        interpreter.set_tensor(self._input_index, input_tensor)
+        interpreter.invoke()
+        return interpreter.get_tensor(self._output_index)
+
+
+class ONNXBackend(InferenceBackend):
+    """ONNX Runtime 后端"""
+
+    name = 'onnx'
+
+    def _load(self):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            self.model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+
+        model_input = self.session.get_inputs()[0]
+        self._input_name = model_input.name
+        # 约定NHWC输入，动态维度保持默认尺寸
+        _, height, width, _ = model_input.shape
+        if isinstance(height, int) and isinstance(width, int):
+            self.input_size = (height, width)
+
+        # 批维度为固定值1的模型只能逐帧推理
+        self._dynamic_batch = not isinstance(model_input.shape[0], int)
+
+    def _run(self, input_tensor):
+        return self.session.run(None, {self._input_name: input_tensor})[0]
+
+    def _run_batch(self, batch):
+        if self._dynamic_batch:
+            return self._run(batch)
+        return np.concatenate([self._run(batch[i:i + 1]) for i in range(len(batch))])
+
+
+class NumpyBackend(InferenceBackend):
+    """纯NumPy参考后端
+
+    模型为 .npz 文件：输入按 grid x grid 网格平均池化成特征，
+    经过一层全连接 (weights, bias) 和 softmax 得到10档评分分布。
+    不依赖任何推理框架，便于在普通Linux机器上测试。
+    """
+
+    name = 'numpy'
+
+    def _load(self):
+        with np.load(self.model_path) as data:
+            self.weights = data['weights'].astype(np.float32)
+            self.bias = data['bias'].astype(np.float32)
+            self.grid = int(data['grid']) if 'grid' in data else 8
+
+        size = self.grid * 28
+        self.input_size = (size, size)
+        # 按最大批大小分配一次，单帧和不满一批时取前几行
+        self._features = np.empty((self.batch_size, self.weights.shape[0]), dtype=np.float32)
+        self._logits = np.empty((self.batch_size, self.weights.shape[1]), dtype=np.float32)
+
+    def _run(self, input_tensor):
+        batch, height, width, channels = input_tensor.shape
+        cell = height // self.grid
+        pooled = input_tensor.reshape(
+            batch, self.grid, cell, self.grid, cell, channels
+        ).mean(axis=(2, 4))
+
+        features = self._features[:batch]
+        np.copyto(features, pooled.reshape(batch, -1))
+        logits = self._logits[:batch]
+        np.matmul(features, self.weights, out=logits)
+        logits += self.bias
+
+        # softmax
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    @staticmethod
+    def save_reference_model(path, grid=8, seed=0):
+        """生成一个确定性的参考模型文件（用于测试和基准）"""
+        rng = np.random.default_rng(seed)
+        weights = rng.normal(0, 0.5, size=(grid * grid * 3, 10)).astype(np.float32)
+        bias = np.linspace(-1, 1, 10).astype(np.float32)
+        np.savez(path, weights=weights, bias=bias, grid=grid)
+
+
+BACKENDS = {
+    '.tflite': TFLiteBackend,
+    '.onnx': ONNXBackend,
+    '.npz': NumpyBackend,
+}
+
+BACKEND_NAMES = {
+    'tflite': TFLiteBackend,
+    'onnx': ONNXBackend,
+    'numpy': NumpyBackend,
+}
+
+
+def create_backend(config):
+    """按配置创建并加载推理后端，模型不可用时返回None（使用启发式评分）"""
+    analysis_config = config.get('local_analysis', {})
+    model_path = analysis_config.get('model_path', '')
+    backend_name = analysis_config.get('inference_backend', 'auto')
+    num_threads = analysis_config.get('num_threads', 2)
+    batch_size = analysis_config.get('batch_size', 4)
+
+    if not model_path or not os.path.exists(model_path):
+        Logger.info(f"InferenceBackend: 未找到模型文件 {model_path}，使用简化评分")
+        return None
+
+    if backend_name == 'auto':
+        backend_class = BACKENDS.get(os.path.splitext(model_path)[1].lower())
+    else:
+        backend_class = BACKEND_NAMES.get(backend_name)
+
+    if backend_class is None:
+        Logger.warning(f"InferenceBackend: 不支持的模型格式: {model_path}")
+        return None
+
+    backend = backend_class(model_path, num_threads=num_threads, batch_size=batch_size)
+    if not backend.load():
+        return None
+    return backend
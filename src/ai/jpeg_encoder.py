@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+JPEG编码模块 - 按字节预算压缩上传图片
+"""
+
+import io
+import threading
+
+import numpy as np
+from PIL import Image
+
+
+class JpegEncoder:
+    """按字节预算编码JPEG
+
+    - 大图先用 Image.reduce 做整数倍盒式缩小，再用双线性缩放到目标尺寸，
+      比直接 LANCZOS 缩放便宜得多
+    - 从上一次满足预算的质量开始编码，超预算时在 [min_quality, 当前质量)
+      内二分查找；相似画面通常一次编码即可命中，余量较大时下次逐步提高质量
+    - 最低质量仍超预算时按3/4缩小尺寸再试，直到满足预算或短边小于
+      MIN_DIMENSION；每个尺寸的质量查找各自最多编码 MAX_ATTEMPTS 次
+    - 每个线程复用一个输出缓冲区
+    """
+
+    # 编码结果低于预算的该比例时，下次编码提高质量
+    HEADROOM = 0.7
+    QUALITY_STEP = 5
+    MAX_ATTEMPTS = 6
+    MIN_DIMENSION = 64
+
+    def __init__(self, max_dimension=1024, max_size_kb=500,
+                 min_quality=40, max_quality=85, initial_quality=85):
+        self.max_dimension = max_dimension
+        self.max_size_kb = max_size_kb
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self._last_quality = initial_quality
+        self._local = threading.local()
+
+        # 最近一次编码的信息
+        self.last_quality = None
+        self.last_attempts = 0
+
+    def encode(self, frame, max_size_kb=None):
+        """编码为JPEG字节，不超过 max_size_kb（图像已缩到最小尺寸时除外）"""
+        budget = (max_size_kb or self.max_size_kb) * 1024
+        img = self._to_image(frame)
+        img = self._resize(img, self.max_dimension)
+
+        attempts = 0
+        while True:
+            data, quality, tries = self._search_quality(img, budget)
+            attempts += tries
+            if len(data) <= budget:
+                break
+            # 最低质量仍超预算，缩小尺寸（编码次数不限制缩小轮数）
+            width, height = img.size
+            if min(width, height) * 3 // 4 < self.MIN_DIMENSION:
+                break
+            img = img.resize((width * 3 // 4, height * 3 // 4), Image.Resampling.BILINEAR)
+
+        self.last_quality = quality
+        self.last_attempts = attempts
+        return data
+
+    def _search_quality(self, img, budget):
+        """二分查找满足预算的最高质量，返回 (数据, 质量, 编码次数)"""
+        encoded = {}
+
+        def encode_at(quality):
+            if quality not in encoded:
+                encoded[quality] = self._encode_once(img, quality)
+            return encoded[quality]
+
+        quality = min(max(self._last_quality, self.min_quality), self.max_quality)
+        data = encode_at(quality)
+
+        if len(data) <= budget:
+            # 满足预算直接使用；余量较大时下次从更高质量开始
+            if len(data) < budget * self.HEADROOM:
+                self._last_quality = min(quality + self.QUALITY_STEP, self.max_quality)
+            return data, quality, 1
+
+        best = None
+        low, high = self.min_quality, quality - 1
+
+        while low <= high and len(encoded) < self.MAX_ATTEMPTS:
+            mid = (low + high) // 2
+            if len(encode_at(mid)) <= budget:
+                best = mid
+                low = mid + 1
+            else:
+                high = mid - 1
+
+        if best is None:
+            # 预算内无解，返回最低质量的结果，由调用方决定是否缩小尺寸
+            best = self.min_quality
+            data = encode_at(best)
+        else:
+            self._last_quality = best
+            data = encoded[best]
+
+        return data, best, len(encoded)
+
+    def _encode_once(self, img, quality):
+        """编码一次，复用当前线程的输出缓冲区"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = io.BytesIO()
+            self._local.buffer = buffer
+        buffer.seek(0)
+        buffer.truncate()
+        img.save(buffer, format='JPEG', quality=quality)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _to_image(frame):
+        """numpy数组或池化帧转PIL图像"""
+        if hasattr(frame, 'rgb'):
+            frame = frame.rgb
+        if isinstance(frame, np.ndarray):
+            return Image.fromarray(np.ascontiguousarray(frame[:, :, :3]))
+        if frame.mode != 'RGB':
+            return frame.convert('RGB')
+        return frame
+
+    @staticmethod
+    def _resize(img, max_dimension):
+        """缩小到最长边不超过 max_dimension"""
+        longest = max(img.size)
+        if longest <= max_dimension:
+            return img
+
+        # 先整数倍盒式缩小（便宜），剩余部分用双线性
+        factor = longest // max_dimension
+        if factor >= 2:
+            img = img.reduce(factor)
+            longest = max(img.size)
+            if longest <= max_dimension:
+                return img
+
+        scale = max_dimension / longest
+        width, height = img.size
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return img.resize(size, Image.Resampling.BILINEAR)
@@ -6,64 +6,180 @@
 from kivy.logger import Logger
 import numpy as np
 
+from src.ai.frame_pyramid import FramePyramid
+from src.ai.frame_stats import luma_stats
+from src.ai.change_detector import SceneChangeDetector
+from src.ai.inference_backend import create_backend
+from src.diagnostics import tracing
+
 
 class LocalAnalyzer:
     """本地分析器 - 简化版"""
     
     def __init__(self, config):
         self.config = config
-        self.enabled = config.get('local_analysis', {}).get('enabled', True)
+        analysis_config = config.get('local_analysis', {})
+        self.enabled = analysis_config.get('enabled', True)
+        self.proxy_width = analysis_config.get('proxy_width', 320)
+        
+        # 画面基本不变时复用上一次结果
+        self.change_detector = SceneChangeDetector(
+            threshold=analysis_config.get('change_threshold', 3.0),
+            max_reuse=analysis_config.get('max_reuse_frames', 10)
+        )
+        self.change_gating = analysis_config.get('change_gating', True)
+        self.last_result = None
+        
+        # 美学评分模型，initialize() 时加载一次
+        self.backend = None
         Logger.info("LocalAnalyzer: 初始化本地分析器（简化版）")
     
     def initialize(self):
         """初始化分析器"""
+        self.change_detector.reset()
+        self.last_result = None
+        
+        if self.backend is None:
+            self.backend = create_backend(self.config)
         Logger.info("LocalAnalyzer: 分析器初始化完成")
         return True
     
     def analyze_frame(self, frame):
-        """分析帧 - 简化版实现"""
+        """分析帧 - 简化版实现
+
+        frame 可以是RGB数组、池化帧或已构建的 FramePyramid。
+        """
         if not self.enabled:
             return None
         
+        with tracing.span('analysis.analyze_frame', getattr(frame, 'frame_id', None)):
+            return self._analyze_frame(frame)
+    
+    def _analyze_frame(self, frame):
+        """analyze_frame 的实现"""
         try:
-            # 简单的亮度和对比度分析
-            if isinstance(frame, np.ndarray):
-                brightness = np.mean(frame)
-                contrast = np.std(frame)
-                
-                # 简单评分算法
-                score = self._calculate_simple_score(brightness, contrast)
-                
-                # 生成建议
-                suggestions = self._generate_suggestions(brightness, contrast, score)
-                
-                return {
-                    'score': score,
-                    'brightness': brightness,
-                    'contrast': contrast,
-                    'suggestions': suggestions
-                }
+            if not isinstance(frame, (np.ndarray, FramePyramid)) and not hasattr(frame, 'rgb'):
+                return None
             
-            return None
+            # 每帧只构建一次金字塔，所有分析共享
+            pyramid = FramePyramid.from_frame(frame, self.proxy_width)
+            
+            # 画面未明显变化时直接复用上一次结果
+            signature = None
+            if self.change_gating:
+                signature = self.change_detector.signature(pyramid)
+                if self.change_detector.check(signature) and self.last_result is not None:
+                    return self.last_result
+            
+            # 有模型时使用模型评分，否则使用简单评分算法
+            result = self._build_result(pyramid, self._score_with_model(pyramid))
+            if result is None:
+                return None
+            
+            if signature is not None:
+                self.change_detector.update(signature)
+            self.last_result = result
+            return result
         except Exception as e:
             Logger.error(f"LocalAnalyzer: 分析失败: {e}")
             return None
     
+    def analyze_batch(self, frames):
+        """批量分析多帧（连拍选优、离线重新评分）
+
+        所有帧的模型输入堆叠成批，每批只推理一次；不做画面变化
+        检测，也不影响实时分析的缓存结果。返回与输入一一对应的列表。
+        """
+        if not self.enabled or not frames:
+            return [None] * len(frames)
+        
+        try:
+            pyramids = [FramePyramid.from_frame(frame, self.proxy_width) for frame in frames]
+            
+            model_scores = [None] * len(pyramids)
+            if self.backend is not None:
+                try:
+                    model_scores = self.backend.predict_batch(
+                        [self._model_input(p) for p in pyramids]
+                    )
+                except Exception as e:
+                    Logger.error(f"LocalAnalyzer: 批量推理失败: {e}")
+            
+            return [
+                self._build_result(pyramid, model_score)
+                for pyramid, model_score in zip(pyramids, model_scores)
+            ]
+        except Exception as e:
+            Logger.error(f"LocalAnalyzer: 批量分析失败: {e}")
+            return [None] * len(frames)
+    
+    def _build_result(self, pyramid, model_score):
+        """由曝光统计和模型评分生成分析结果"""
+        # 亮度直方图统计，一次得到亮度、对比度和裁切比例
+        stats = self._analyze_exposure(pyramid)
+        if stats is None:
+            return None
+        brightness = stats['mean']
+        contrast = stats['std']
+        
+        if model_score is not None:
+            score = round(model_score, 1)
+        else:
+            score = self._calculate_simple_score(brightness, contrast)
+        
+        # 生成建议
+        suggestions = self._generate_suggestions(brightness, contrast, score, stats)
+        
+        return {
+            'score': score,
+            'brightness': brightness,
+            'contrast': contrast,
+            'shadow_clip': stats['shadow_clip'],
+            'highlight_clip': stats['highlight_clip'],
+            'dynamic_range': stats['dynamic_range'],
+            'score_source': 'model' if model_score is not None else 'heuristic',
+            'suggestions': suggestions
+        }
+    
+    def _analyze_exposure(self, pyramid):
+        """曝光统计（代理层亮度直方图）"""
+        return luma_stats(pyramid.luma)
+    
+    @staticmethod
+    def _model_input(pyramid):
+        """模型输入固定取1/4层
+
+        代理层随自适应帧率的 proxy_width 在 quarter/sixteenth 之间切换，
+        用它作模型输入时评分会随CPU负载而不是画面变化。
+        """
+        return pyramid.quarter
+    
+    def _score_with_model(self, pyramid):
+        """模型评分（使用1/4层作为输入）"""
+        if self.backend is None:
+            return None
+        try:
+            return self.backend.predict(self._model_input(pyramid))
+        except Exception as e:
+            Logger.error(f"LocalAnalyzer: 模型推理失败: {e}")
+            return None
+    
     def _calculate_simple_score(self, brightness, contrast):
         """计算简单评分"""
         # 理想亮度范围: 100-150
         brightness_score = 10 - abs(brightness - 125) / 12.5
         brightness_score = max(0, min(10, brightness_score))
         
-        # 理想对比度范围: 40-80
-        contrast_score = 10 - abs(contrast - 60) / 6
+        # 理想对比度范围: 28-56（亮度标准差；彩色画面约为原RGB标准差的0.7倍，
+        # 原按RGB标准差标定的 40-80 等比换算）
+        contrast_score = 10 - abs(contrast - 42) / 4.2
         contrast_score = max(0, min(10, contrast_score))
         
         # 综合评分
         score = (brightness_score * 0.4 + contrast_score * 0.6)
         return round(score, 1)
     
-    def _generate_suggestions(self, brightness, contrast, score):
+    def _generate_suggestions(self, brightness, contrast, score, stats=None):
         """生成建议"""
         suggestions = []
         
@@ -71,10 +187,15 @@ class LocalAnalyzer:
             suggestions.append("光线较暗，建议增加曝光")
         elif brightness > 170:
             suggestions.append("光线过亮，建议降低曝光")
+        elif stats and stats['highlight_clip'] > 0.05:
+            suggestions.append("高光溢出，建议降低曝光")
+        elif stats and stats['shadow_clip'] > 0.1:
+            suggestions.append("暗部细节丢失，建议补光")
         
-        if contrast < 30:
+        # 阈值按亮度标准差标定（原RGB标准差 30/90 的0.7倍）
+        if contrast < 21:
             suggestions.append("画面对比度较低，建议调整角度")
-        elif contrast > 90:
+        elif contrast > 63:
             suggestions.append("对比度过高，注意光线平衡")
         
         if score >= 8:
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+云端结果缓存模块 - 按感知哈希缓存云端评分，相似画面直接返回
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from kivy.logger import Logger
+
+from src.ai.image_hash import hamming_distance
+
+
+class CloudResultCache:
+    """云端评分结果缓存
+
+    以画面dHash为键，汉明距离不超过 max_distance 视为同一场景。
+    按LRU淘汰，超过 ttl 秒的条目失效；指定 path 时写入JSON文件，
+    应用重启后仍可命中。多个云端工作线程同时写入时，文件按写入顺序
+    串行保存，较旧的快照不会覆盖较新的快照。
+    """
+
+    def __init__(self, max_entries=32, ttl=600, max_distance=6, path=''):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.path = path
+        self._entries = OrderedDict()  # 哈希 -> (写入时间, 结果)
+        self._lock = threading.Lock()
+
+        # 写文件单独加锁，不阻塞查找；代数用来跳过已过时的快照
+        self._save_lock = threading.Lock()
+        self._generation = 0
+        self._saved_generation = 0
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+
+        if self.path:
+            self._load()
+
+    def lookup(self, image_hash):
+        """查找相似画面的缓存结果，未命中返回None"""
+        now = time.time()
+        with self._lock:
+            best_key = None
+            best_distance = self.max_distance + 1
+            expired = []
+
+            for key, (stored_at, _) in self._entries.items():
+                if now - stored_at > self.ttl:
+                    expired.append(key)
+                    continue
+                distance = hamming_distance(key, image_hash)
+                if distance < best_distance:
+                    best_key = key
+                    best_distance = distance
+                    if distance == 0:
+                        break
+
+            for key in expired:
+                del self._entries[key]
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][1]
+
+    def store(self, image_hash, result):
+        """写入一条结果"""
+        with self._lock:
+            self._entries[image_hash] = (time.time(), result)
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            snapshot = list(self._entries.items()) if self.path else None
+            self._generation += 1
+            generation = self._generation
+
+        if snapshot is not None:
+            self._save(snapshot, generation)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            generation = self._generation
+        if self.path:
+            self._save([], generation)
+
+    def get_stats(self):
+        """获取统计信息"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def _load(self):
+        """从文件加载未过期的条目"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            for item in data.get('entries', []):
+                if now - item['time'] <= self.ttl:
+                    self._entries[int(item['hash'], 16)] = (item['time'], item['result'])
+            Logger.info(f"CloudResultCache: 已加载 {len(self._entries)} 条缓存")
+        except Exception as e:
+            Logger.error(f"CloudResultCache: 加载缓存失败: {e}")
+
+    def _save(self, entries, generation):
+        """写入文件（临时文件+重命名，避免写坏）
+
+        generation 不比已写入的快照新时直接跳过。
+        """
+        with self._save_lock:
+            if generation <= self._saved_generation:
+                return
+            self._write(entries)
+            self._saved_generation = generation
+
+    def _write(self, entries):
+        """序列化并替换缓存文件（调用方持有 _save_lock）"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            data = {
+                'entries': [
+                    {'hash': f'{key:016x}', 'time': stored_at, 'result': result}
+                    for key, (stored_at, result) in entries
+                ]
+            }
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            Logger.error(f"CloudResultCache: 保存缓存失败: {e}")
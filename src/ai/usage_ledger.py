@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+API用量账本模块 - 内存计数 + 追加写日志文件，按月自动重置
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+from kivy.logger import Logger
+
+
+class UsageLedger:
+    """API用量账本
+
+    每次调用只在内存中加计数并缓存一行记录，累计 flush_every 条时
+    立即追加写入文件并 fsync，否则由后台定时器在 flush_interval 秒后
+    写盘，之后没有新调用也不会一直留在内存里。
+    文件每行为 "<账期> <时间戳> <次数>"，启动时只统计当前账期的记录；
+    崩溃时最多丢失尚未写盘的几条记录，写坏的末行会被忽略，配置文件
+    不会被改写。
+
+    账期以 reset_date（YYYY-MM-DD，取其中的日）为每月的重置日，
+    未配置时按自然月。下次重置时间预先算好，查询剩余额度为O(1)。
+    """
+
+    def __init__(self, path, monthly_limit=10000, reset_date='',
+                 flush_every=16, flush_interval=5.0):
+        self.path = path
+        self.monthly_limit = monthly_limit
+        self.reset_day = self._parse_reset_day(reset_date)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self._count = 0
+        self._period = None
+        self._next_reset = 0.0
+
+        self._start_period(time.time())
+        self._load()
+
+    @property
+    def current(self):
+        """当前账期已用次数"""
+        with self._lock:
+            self._check_rollover(time.time())
+            return self._count
+
+    @property
+    def remaining(self):
+        """当前账期剩余次数"""
+        return max(0, self.monthly_limit - self.current)
+
+    @property
+    def period(self):
+        """当前账期（YYYY-MM）"""
+        return self._period
+
+    def record(self, count=1):
+        """记录用量"""
+        now = time.time()
+        with self._lock:
+            self._check_rollover(now)
+            self._count += count
+            self._buffer.append(f"{self._period} {now:.3f} {count}\n")
+
+            if (len(self._buffer) >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+            elif self._timer is None:
+                # 定时写盘，缓冲区不满时记录也不会无限期停留在内存中
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """立即写盘"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """关闭账本（写入剩余记录）"""
+        self.flush()
+
+    def _flush_locked(self):
+        """追加写入并fsync（调用方持有锁）"""
+        self._last_flush = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(self._buffer))
+                f.flush()
+                os.fsync(f.fileno())
+            self._buffer = []
+        except Exception as e:
+            Logger.error(f"UsageLedger: 写入用量记录失败: {e}")
+
+    def _load(self):
+        """统计文件中当前账期的记录"""
+        if not os.path.exists(self.path):
+            return
+
+        count = 0
+        stale = 0
+        torn = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 3 or not line.endswith('\n'):
+                        torn = True  # 崩溃时写了一半的行
+                        continue
+                    if parts[0] == self._period:
+                        count += int(parts[2])
+                    else:
+                        stale += 1
+        except Exception as e:
+            Logger.error(f"UsageLedger: 读取用量记录失败: {e}")
+            return
+
+        self._count = count
+        Logger.info(f"UsageLedger: 账期 {self._period} 已用 {count}/{self.monthly_limit}")
+
+        # 清理旧账期和残缺行，避免后续追加的记录接在残行后面
+        if stale or torn:
+            self._compact()
+
+    def _compact(self):
+        """丢弃旧账期的记录（临时文件+重命名）"""
+        try:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                if self._count:
+                    f.write(f"{self._period} {time.time():.3f} {self._count}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            Logger.error(f"UsageLedger: 整理用量记录失败: {e}")
+
+    def _check_rollover(self, now):
+        """到达重置时间时开始新账期（调用方持有锁）"""
+        if now < self._next_reset:
+            return
+        self._flush_locked()
+        self._start_period(now)
+        self._count = 0
+        self._compact()
+        Logger.info(f"UsageLedger: 进入新账期 {self._period}")
+
+    def _start_period(self, now):
+        """计算当前账期及下次重置时间"""
+        moment = datetime.fromtimestamp(now)
+        year, month = moment.year, moment.month
+        if moment.day < self.reset_day:
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        self._period = f"{year:04d}-{month:02d}"
+
+        next_year, next_month = (year, month + 1) if month < 12 else (year + 1, 1)
+        self._next_reset = datetime(next_year, next_month, self.reset_day).timestamp()
+
+    @staticmethod
+    def _parse_reset_day(reset_date):
+        """从 YYYY-MM-DD 取重置日（限制在1-28，保证每月都存在）"""
+        if not reset_date:
+            return 1
+        try:
+            day = datetime.strptime(reset_date, '%Y-%m-%d').day
+        except ValueError:
+            Logger.warning(f"UsageLedger: reset_date 格式无效: {reset_date}")
+            return 1
+        return min(max(day, 1), 28)
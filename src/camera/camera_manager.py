@@ -6,6 +6,16 @@
 from kivy.logger import Logger
 from kivy.clock import Clock
 import numpy as np
+import os
+import time
+from datetime import datetime
+
+from src.camera.frame_pool import FramePool
+from src.camera.frame_ring import FrameRing
+from src.camera.frame_source import FrameRecorder, create_frame_source, texture_to_rgba
+from src.camera.rate_controller import AdaptiveRateController
+from src.camera.still_capture import StillCapturePipeline
+from src.diagnostics import metrics, tracing
 
 try:
     from android.permissions import request_permissions, Permission
@@ -20,10 +30,42 @@ class CameraManager:
     
     def __init__(self, config):
         self.config = config
-        self.camera = None
+        self.frame_source = None
         self.is_active = False
         self.preview_callback = None
         
+        # 预览帧缓冲池，回调方使用完帧后需调用 frame.release()
+        pool_size = config.get('camera', {}).get('frame_pool_size', 3)
+        self.frame_pool = FramePool(pool_size)
+        self.frame_count = 0
+        
+        # 按实测耗时自适应调整分析帧率
+        self.rate_controller = AdaptiveRateController(config)
+        self._capture_event = None
+        
+        # 照片按拍摄分辨率单独读取，不占用预览缓冲池
+        self.still_capture = None
+        
+        # 连拍模式：环形缓冲区保存最近几帧预览，快门时从中选优
+        camera_config = config.get('camera', {})
+        # 合成/回放来源按预览帧率单独写入；Kivy相机回读纹理代价高，
+        # 只写入分析定时器已经读取的帧
+        self.frame_ring = None
+        self.burst_fps = camera_config.get('burst_fps', 15)
+        self._ring_event = None
+        self._ring_source_frame = None
+        if camera_config.get('burst_mode', False):
+            self.frame_ring = FrameRing(camera_config.get('burst_frames', 5))
+        
+        # 录制预览帧到回放文件（复现现场问题用）
+        self.recorder = None
+        
+        # 性能指标
+        self._frames_metric = metrics.counter('camera.frames')
+        self._dropped_metric = metrics.counter('camera.dropped')
+        self._capture_metric = metrics.histogram('camera.capture_ms')
+        self._fps_metric = metrics.gauge('camera.target_fps')
+        
         Logger.info("CameraManager: 初始化相机管理器")
         
     def initialize(self):
@@ -49,33 +91,48 @@ class CameraManager:
         ])
     
     def _setup_camera(self):
-        """设置相机"""
-        from kivy.uix.camera import Camera
-        
+        """按配置创建帧来源（Kivy相机、合成画面或回放文件）"""
         camera_config = self.config.get('camera', {})
-        resolution = camera_config.get('preview_resolution', [1280, 720])
+        source = create_frame_source(camera_config)
+        if not source.open():
+            raise RuntimeError(f"帧来源 {source.name} 打开失败")
+        self.frame_source = source
         
-        self.camera = Camera(
-            resolution=resolution,
-            play=False
+        Logger.info(
+            f"CameraManager: 相机设置完成，帧来源: {source.name}，"
+            f"分辨率: {camera_config.get('preview_resolution', [1280, 720])}"
         )
         
-        Logger.info(f"CameraManager: 相机设置完成，分辨率: {resolution}")
+        self.still_capture = StillCapturePipeline(
+            source,
+            camera_config.get('capture_resolution', [4000, 3000]),
+            strip_rows=camera_config.get('still_strip_rows', 256),
+            buffer_count=camera_config.get('still_buffers', 2)
+        )
     
     def start_preview(self, callback=None):
         """开始预览"""
-        if not self.camera:
+        if not self.frame_source:
             Logger.error("CameraManager: 相机未初始化")
             return False
         
         try:
-            self.camera.play = True
+            self.frame_source.start()
             self.is_active = True
             self.preview_callback = callback
             
             # 启动帧捕获定时器
-            fps = self.config.get('local_analysis', {}).get('analysis_fps', 2)
-            Clock.schedule_interval(self._capture_frame, 1.0 / fps)
+            self._schedule_capture(self.rate_controller.fps)
+            # 取帧无需复制的来源按预览帧率单独写入连拍缓冲区，
+            # 否则由 _capture_frame 把已读取的池化帧写入
+            if (self.frame_ring is not None and self._ring_event is None
+                    and self.frame_source.zero_copy_peek):
+                self._ring_event = Clock.schedule_interval(
+                    self._push_ring_frame, 1.0 / self.burst_fps
+                )
+            
+            if self.config.get('camera', {}).get('record_session', False):
+                self.start_recording()
             
             Logger.info("CameraManager: 相机预览已启动")
             return True
@@ -85,55 +142,186 @@ class CameraManager:
     
     def stop_preview(self):
         """停止预览"""
-        if self.camera:
-            self.camera.play = False
+        if self.frame_source:
+            self.frame_source.stop()
             self.is_active = False
-            Clock.unschedule(self._capture_frame)
+            if self._capture_event:
+                self._capture_event.cancel()
+                self._capture_event = None
+            if self._ring_event:
+                self._ring_event.cancel()
+                self._ring_event = None
+            self.stop_recording()
             Logger.info("CameraManager: 相机预览已停止")
     
+    def start_recording(self, path=None):
+        """开始把预览帧录制为回放文件，返回文件路径
+        
+        未指定路径时写入 camera.record_dir，文件名带时间戳。
+        """
+        self.stop_recording()
+        camera_config = self.config.get('camera', {})
+        if path is None:
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(
+                camera_config.get('record_dir', 'recordings'), f"session_{stamp}.frames"
+            )
+        self.recorder = FrameRecorder(
+            path,
+            fps=self.rate_controller.fps,
+            max_frames=camera_config.get('record_max_frames', 600)
+        )
+        return path
+    
+    def stop_recording(self):
+        """结束录制，返回录制文件路径（没有在录制时返回None）
+        
+        不等待写盘：剩余的帧由写入线程写完，需要立即回放时调用
+        recorder.join()。
+        """
+        if self.recorder is None:
+            return None
+        recorder = self.recorder
+        self.recorder = None
+        recorder.close()
+        return recorder.path
+    
+    def _schedule_capture(self, fps):
+        """按指定帧率（重新）安排帧捕获定时器"""
+        if self._capture_event:
+            self._capture_event.cancel()
+        self._capture_event = Clock.schedule_interval(self._capture_frame, 1.0 / fps)
+    
+    def get_effective_fps(self):
+        """当前实际分析帧率"""
+        return self.rate_controller.effective_fps
+    
     def _capture_frame(self, dt):
         """捕获当前帧"""
-        if not self.is_active or not self.camera:
+        if not self.is_active or not self.frame_source:
             return
         
+        controller = self.rate_controller
+        controller.record_frame_time(Clock.frametime)
+        if controller.tick():
+            self._schedule_capture(controller.fps)
+            Logger.info(
+                f"CameraManager: 分析帧率调整为 {controller.fps}fps，"
+                f"代理宽度 {controller.proxy_width}"
+            )
+        
+        with tracing.span('camera.capture_frame') as span:
+            start = time.perf_counter()
+            try:
+                # 从帧来源读取（视图，不复制）
+                rgba = self.frame_source.read()
+                if rgba is not None:
+                    # 读取到池化缓冲区，缓冲池耗尽时跳过这一帧
+                    frame = self._pixels_to_frame(rgba)
+                    if frame is None:
+                        self._dropped_metric.inc()
+                        return
+                    span.set_frame(frame.frame_id)
+                    elapsed = time.perf_counter() - start
+                    controller.record_capture(elapsed)
+                    self._frames_metric.inc()
+                    self._capture_metric.observe(elapsed * 1000)
+                    self._fps_metric.set(controller.fps)
+                    
+                    if self.frame_ring is not None and not self.frame_source.zero_copy_peek:
+                        self.frame_ring.push(frame)
+                    
+                    # 采集耗时已在上面记录；录制只复制到队列，写盘在后台线程
+                    if self.recorder is not None:
+                        self.recorder.write(frame.rgba)
+                        if not self.recorder.active:
+                            # 录满或出错后停止，close() 只投递结束标记不等待
+                            self.recorder.close()
+                            self.recorder = None
+                    
+                    # 调用回调函数，帧的所有权交给回调方
+                    if self.preview_callback:
+                        self.preview_callback(frame)
+                    else:
+                        frame.release()
+            except Exception as e:
+                Logger.error(f"CameraManager: 捕获帧失败: {e}")
+    
+    def _push_ring_frame(self, dt):
+        """按预览帧率把当前画面写入连拍缓冲区（不推进帧来源）"""
+        if not self.is_active or not self.frame_source:
+            return
         try:
-            # 获取相机纹理
-            texture = self.camera.texture
-            if texture:
-                # 转换为numpy数组
-                frame = self._texture_to_numpy(texture)
-                
-                # 调用回调函数
-                if self.preview_callback:
-                    self.preview_callback(frame)
+            rgba = self.frame_source.peek()
+            # 合成/回放来源在分析定时器推进之前返回同一帧，不重复写入
+            if rgba is None or rgba is self._ring_source_frame:
+                return
+            self._ring_source_frame = rgba
+            self.frame_ring.push(rgba)
         except Exception as e:
-            Logger.error(f"CameraManager: 捕获帧失败: {e}")
+            Logger.error(f"CameraManager: 写入连拍缓冲区失败: {e}")
     
-    def _texture_to_numpy(self, texture):
-        """将Kivy纹理转换为numpy数组"""
-        # 获取像素数据
-        pixels = texture.pixels
-        size = texture.size
-        
-        # 转换为numpy数组
-        frame = np.frombuffer(pixels, dtype=np.uint8)
-        frame = frame.reshape(size[1], size[0], 4)  # RGBA
+    def refresh_ring(self):
+        """快门时补写当前画面（只缓存分析帧的来源，最新一帧可能已超出选优窗口）"""
+        if (self.frame_ring is None or not self.is_active or not self.frame_source
+                or self.frame_source.zero_copy_peek):
+            return
+        try:
+            rgba = self.frame_source.peek()
+            if rgba is not None:
+                self.frame_ring.push(rgba)
+        except Exception as e:
+            Logger.error(f"CameraManager: 写入连拍缓冲区失败: {e}")
+    
+    def _texture_to_frame(self, texture):
+        """将Kivy纹理读取到池化帧中（复用预分配缓冲区）"""
+        return self._pixels_to_frame(texture_to_rgba(texture))
+    
+    def _pixels_to_frame(self, rgba):
+        """将帧来源给出的RGBA数组复制到池化帧中"""
+        height, width = rgba.shape[:2]
+        frame = self.frame_pool.acquire(width, height)
+        if frame is None:
+            return None
         
-        # 转换为RGB
-        frame = frame[:, :, :3]
+        try:
+            with tracing.span('camera.pixels_to_frame'):
+                frame.load_rgba(rgba)
+        except Exception:
+            frame.release()
+            raise
         
+        self.frame_count += 1
+        frame.frame_id = self.frame_count
+        frame.timestamp = Clock.get_time()
         return frame
     
+    def _texture_to_numpy(self, texture):
+        """将Kivy纹理转换为连续的RGB数组（调用者持有）"""
+        # RGBA视图，不复制；只复制一次得到连续的RGB
+        with tracing.span('camera.texture_to_numpy'):
+            return np.ascontiguousarray(texture_to_rgba(texture)[:, :, :3])
+    
+    def capture_still(self, callback):
+        """按拍摄分辨率拍照（不阻塞），完成后在UI线程调用 callback(photo)
+
+        photo 使用完毕后调用 still_capture.release(photo) 归还缓冲区。
+        """
+        if not self.still_capture or not self.is_active:
+            Logger.error("CameraManager: 无法拍照，相机未激活")
+            return False
+        return self.still_capture.capture(callback)
+    
     def capture_photo(self):
-        """拍摄照片"""
-        if not self.camera or not self.is_active:
+        """抓取当前预览画面（云端分析使用，分辨率为预览分辨率）"""
+        if not self.frame_source or not self.is_active:
             Logger.error("CameraManager: 无法拍照，相机未激活")
             return None
         
         try:
-            texture = self.camera.texture
-            if texture:
-                frame = self._texture_to_numpy(texture)
+            rgba = self.frame_source.peek()
+            if rgba is not None:
+                frame = np.ascontiguousarray(rgba[:, :, :3])
                 Logger.info("CameraManager: 照片拍摄成功")
                 return frame
             return None
@@ -142,11 +330,17 @@ class CameraManager:
             return None
     
     def get_camera_widget(self):
-        """获取相机控件"""
-        return self.camera
+        """获取相机控件（合成和回放来源没有控件，返回None）"""
+        return self.frame_source.widget if self.frame_source else None
     
     def release(self):
         """释放相机资源"""
         self.stop_preview()
-        self.camera = None
+        self.frame_pool.clear()
+        if self.frame_ring is not None:
+            self.frame_ring.clear()
+        self._ring_source_frame = None
+        if self.frame_source:
+            self.frame_source.close()
+        self.frame_source = None
         Logger.info("CameraManager: 相机资源已释放")
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+帧缓冲池模块 - 预分配并复用帧缓冲区，避免每帧分配大块内存
+"""
+
+import threading
+
+import numpy as np
+
+
+# 整数亮度权重（BT.601，放大256倍）
+LUMA_WEIGHTS = (77, 150, 29)
+
+
+def rgb_to_luma(rgb, out=None, scratch=None):
+    """RGB转亮度（整数运算，结果为uint8）
+
+    rgb 可以是RGBA缓冲区的非连续RGB视图；scratch 为两个与画面
+    同尺寸的uint16临时缓冲区，传入后不再分配中间数组。
+    """
+    height, width = rgb.shape[:2]
+    if out is None:
+        out = np.empty((height, width), dtype=np.uint8)
+    if scratch is None:
+        acc = np.empty((height, width), dtype=np.uint16)
+        tmp = np.empty((height, width), dtype=np.uint16)
+    else:
+        acc, tmp = scratch
+
+    wr, wg, wb = LUMA_WEIGHTS
+    np.multiply(rgb[..., 0], wr, out=acc, dtype=np.uint16)
+    np.multiply(rgb[..., 1], wg, out=tmp, dtype=np.uint16)
+    acc += tmp
+    np.multiply(rgb[..., 2], wb, out=tmp, dtype=np.uint16)
+    acc += tmp
+    acc >>= 8
+    np.copyto(out, acc, casting='unsafe')
+    return out
+
+
+class PooledFrame:
+    """池化帧 - 持有一块预分配的RGBA缓冲区
+
+    rgba/rgb/luma 都是缓冲区上的视图，不会额外复制。
+    使用完毕后必须调用 release() 归还缓冲池。
+    """
+
+    def __init__(self, pool, generation, width, height):
+        self._pool = pool
+        self._generation = generation
+        self._refcount = 0
+        self._luma = None
+        self._luma_valid = False
+        self._scratch = None
+
+        self.width = width
+        self.height = height
+        self.rgba = np.empty((height, width, 4), dtype=np.uint8)
+        self.rgb = self.rgba[:, :, :3]
+        self.frame_id = 0
+        self.timestamp = 0.0
+
+    @property
+    def shape(self):
+        """RGB形状 (高, 宽, 3)"""
+        return self.rgb.shape
+
+    @property
+    def luma(self):
+        """亮度平面（首次访问时计算，结果缓存到帧被复用为止）"""
+        if not self._luma_valid:
+            if self._luma is None:
+                self._luma = np.empty((self.height, self.width), dtype=np.uint8)
+                self._scratch = (
+                    np.empty((self.height, self.width), dtype=np.uint16),
+                    np.empty((self.height, self.width), dtype=np.uint16)
+                )
+            rgb_to_luma(self.rgb, out=self._luma, scratch=self._scratch)
+            self._luma_valid = True
+        return self._luma
+
+    def load_pixels(self, pixels):
+        """从RGBA字节数据填充缓冲区"""
+        source = np.frombuffer(pixels, dtype=np.uint8)
+        np.copyto(self.rgba.reshape(-1), source[:self.rgba.size])
+        self._luma_valid = False
+
+    def load_rgba(self, rgba):
+        """从 (高, 宽, 4) 的RGBA数组填充缓冲区（可以是非连续视图）"""
+        np.copyto(self.rgba, rgba)
+        self._luma_valid = False
+
+    def copy_rgb(self):
+        """复制一份连续的RGB数组（调用者持有，可跨帧保留）"""
+        return np.ascontiguousarray(self.rgb)
+
+    def retain(self):
+        """增加引用计数（帧需要交给多个使用者时）"""
+        with self._pool._lock:
+            self._refcount += 1
+        return self
+
+    def release(self):
+        """释放引用，计数归零时归还缓冲池"""
+        self._pool._release(self)
+
+
+class FramePool:
+    """帧缓冲池
+
+    预分配固定数量的RGBA缓冲区，每次采集时复用空闲缓冲区。
+    缓冲区耗尽时 acquire() 返回None，由调用者跳过这一帧。
+    """
+
+    def __init__(self, size=3):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._free = []
+        self._width = 0
+        self._height = 0
+        self._generation = 0
+        self._allocated = 0
+
+        # 统计
+        self.acquired = 0
+        self.exhausted = 0
+
+    @property
+    def in_use(self):
+        """正在使用的帧数"""
+        with self._lock:
+            return self._allocated - len(self._free)
+
+    def acquire(self, width, height):
+        """获取一个空闲帧，尺寸变化时重建缓冲池"""
+        with self._lock:
+            if (width, height) != (self._width, self._height):
+                # 分辨率变化，旧帧归还时直接丢弃
+                self._generation += 1
+                self._width = width
+                self._height = height
+                self._free = []
+                self._allocated = 0
+
+            if self._free:
+                frame = self._free.pop()
+            elif self._allocated < self.size:
+                frame = PooledFrame(self, self._generation, width, height)
+                self._allocated += 1
+            else:
+                self.exhausted += 1
+                return None
+
+            frame._refcount = 1
+            self.acquired += 1
+            return frame
+
+    def get_stats(self):
+        """获取统计信息"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'allocated': self._allocated,
+                'in_use': self._allocated - len(self._free),
+                'acquired': self.acquired,
+                'exhausted': self.exhausted,
+            }
+
+    def clear(self):
+        """丢弃所有空闲缓冲区"""
+        with self._lock:
+            self._generation += 1
+            self._free = []
+            self._allocated = 0
+
+    def _release(self, frame):
+        """归还帧"""
+        with self._lock:
+            if frame._refcount <= 0:
+                return
+            frame._refcount -= 1
+            if frame._refcount > 0:
+                return
+            if frame._generation == self._generation:
+                self._free.append(frame)
@@ -0,0 +1,587 @@
+# -*- coding: utf-8 -*-
+"""
+帧来源模块 - 统一Kivy相机、合成画面和回放文件的取帧接口，并可录制回放文件
+
+回放文件格式（小端）：
+    32字节文件头  magic(8s) version(I) width(I) height(I) frame_count(I) fps(f) 保留(4x)
+    之后紧跟 frame_count 帧 RGBA 像素，每帧 width*height*4 字节，没有分隔
+"""
+
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+
+FRAME_FILE_MAGIC = b'AICFRAME'
+FRAME_FILE_VERSION = 1
+FRAME_FILE_HEADER = struct.Struct('<8sIIIIf4x')
+
+
+def texture_to_rgba(texture):
+    """Kivy纹理像素的RGBA视图 (高, 宽, 4)，不复制"""
+    width, height = texture.size
+    return np.frombuffer(texture.pixels, dtype=np.uint8).reshape(height, width, 4)
+
+
+def still_from_rgba(rgba):
+    """把一帧RGBA数组包装为 open_still() 的返回值 (宽, 高, read_rows)"""
+    height, width = rgba.shape[:2]
+
+    def read_rows(y0, y1, out):
+        out[...] = rgba[y0:y1, :, :3]
+
+    return width, height, read_rows
+
+
+class FrameSource:
+    """帧来源基类
+
+    read() 返回下一帧 (高, 宽, 4) 的RGBA数组，可以是只读的非连续视图，
+    来源之后不会改写它的内容；没有画面时返回None。peek() 返回最近
+    一帧但不前进。
+
+    zero_copy_peek 为False的来源每次取新画面都要复制（如从GPU回读
+    纹理），不能按预览帧率额外取帧，连拍缓冲区改用已读取的分析帧。
+    """
+
+    name = 'base'
+    zero_copy_peek = True
+
+    def __init__(self):
+        self.widget = None
+        self._still_warned = False
+
+        # 统计
+        self.frames_read = 0
+
+    def open(self):
+        """打开来源，成功返回True"""
+        return True
+
+    def close(self):
+        """关闭来源"""
+
+    def start(self):
+        """开始出帧"""
+
+    def stop(self):
+        """暂停出帧"""
+
+    def read(self):
+        """读取下一帧"""
+        raise NotImplementedError
+
+    def peek(self):
+        """最近一帧（不前进），还没有读过时读取一帧"""
+        return self.read()
+
+    def open_still(self, resolution):
+        """按拍摄分辨率取照片，返回 (宽, 高, read_rows)，没有画面时返回None
+
+        默认用当前预览画面代替，分辨率不一致时记录一次警告。
+        read_rows(y0, y1, out) 把第 y0..y1 行的RGB写入 out，可在工作线程调用。
+        """
+        rgba = self.peek()
+        if rgba is None:
+            return None
+
+        height, width = rgba.shape[:2]
+        if (width, height) != tuple(resolution) and not self._still_warned:
+            self._still_warned = True
+            Logger.warning(
+                f"{type(self).__name__}: 不支持 {resolution[0]}x{resolution[1]} 拍摄，"
+                f"使用预览分辨率 {width}x{height}"
+            )
+        return still_from_rgba(rgba)
+
+    def request_still(self, resolution, callback):
+        """请求一张照片（UI线程调用，不阻塞）
+
+        画面就绪后在UI线程调用 callback(opened)，opened 同 open_still()
+        的返回值。需要切换摄像头分辨率的来源异步回调，默认直接回调。
+        返回请求是否已受理。
+        """
+        callback(self.open_still(resolution))
+        return True
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'source': self.name,
+            'frames_read': self.frames_read,
+        }
+
+
+class KivyCameraSource(FrameSource):
+    """Kivy相机来源
+
+    Camera 控件在 open() 时才创建，widget 交给界面显示预览。
+    Kivy Camera 无法在预览过程中切换分辨率，拍照时以拍摄分辨率短暂
+    重新打开摄像头，取到第一帧后恢复预览分辨率；期间 read() 返回
+    None，预览和分析暂停。still_timeout 秒内没有取到新画面（摄像头
+    不支持该分辨率或重新打开失败）时使用快门时的预览画面。
+    """
+
+    name = 'kivy'
+    # 每次读取都要从GPU回读纹理并分配新缓冲区
+    zero_copy_peek = False
+
+    def __init__(self, resolution, still_timeout=2.0):
+        super().__init__()
+        self.resolution = list(resolution)
+        self.still_timeout = still_timeout
+        self._current = None
+        self._current_frame = -1
+
+        # 进行中的照片请求
+        self._still_callback = None
+        self._still_fallback = None
+        self._still_texture = None
+        self._still_deadline = 0.0
+        self._still_event = None
+
+        # 统计
+        self.still_reopens = 0
+        self.still_fallbacks = 0
+
+    def open(self):
+        from kivy.uix.camera import Camera
+
+        self.widget = Camera(resolution=self.resolution, play=False)
+        return True
+
+    def close(self):
+        self._finish_still(None)
+        self.stop()
+        self.widget = None
+        self._current = None
+
+    def start(self):
+        if self.widget:
+            self.widget.play = True
+
+    def stop(self):
+        if self.widget:
+            self.widget.play = False
+
+    def read(self):
+        texture = self.widget.texture if self.widget else None
+        if not texture or self._still_callback is not None:
+            return None
+        self.frames_read += 1
+        self._current = texture_to_rgba(texture)
+        self._current_frame = Clock.frames
+        return self._current
+
+    def peek(self):
+        # 同一个Clock帧内已读取过时直接返回，不再回读纹理
+        if self._current is not None and self._current_frame == Clock.frames:
+            return self._current
+        return self.read()
+
+    def request_still(self, resolution, callback):
+        """以拍摄分辨率重新打开摄像头，取到一帧后恢复预览并回调"""
+        if self.widget is None:
+            return False
+        if self._still_callback is not None:
+            Logger.warning("KivyCameraSource: 上一张照片还在拍摄")
+            return False
+        if list(resolution) == self.resolution:
+            return super().request_still(resolution, callback)
+
+        # 快门时的预览画面，拍摄分辨率打不开时使用
+        self._still_fallback = self.peek()
+        self._still_texture = self.widget.texture
+        self._still_callback = callback
+        self._still_deadline = time.monotonic() + self.still_timeout
+        self.still_reopens += 1
+        Logger.info(
+            f"KivyCameraSource: 以 {resolution[0]}x{resolution[1]} 重新打开摄像头拍照"
+        )
+        self._reopen(resolution)
+        self._still_event = Clock.schedule_interval(self._poll_still, 1 / 30.0)
+        return True
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['still_reopens'] = self.still_reopens
+        stats['still_fallbacks'] = self.still_fallbacks
+        return stats
+
+    def _reopen(self, resolution):
+        """按分辨率重建摄像头（先停止旧摄像头，Camera 控件重建时不会停止它）"""
+        playing = self.widget.play
+        self.widget.play = False
+        self.widget.resolution = list(resolution)
+        self.widget.play = playing
+
+    def _poll_still(self, dt):
+        """等待拍摄分辨率的第一帧"""
+        texture = self.widget.texture if self.widget else None
+        fresh = texture is not None and texture is not self._still_texture
+        if fresh and list(texture.size) == self.resolution:
+            fresh = False  # 仍是预览尺寸的纹理
+        if not fresh and time.monotonic() < self._still_deadline:
+            return
+
+        rgba = texture_to_rgba(texture) if fresh else None
+        self._reopen(self.resolution)
+        if rgba is None:
+            self.still_fallbacks += 1
+            Logger.warning("KivyCameraSource: 拍摄分辨率未就绪，使用预览画面")
+            rgba = self._still_fallback
+        self._finish_still(still_from_rgba(rgba) if rgba is not None else None)
+
+    def _finish_still(self, opened):
+        """结束照片请求并回调"""
+        callback = self._still_callback
+        if self._still_event is not None:
+            self._still_event.cancel()
+            self._still_event = None
+        self._still_callback = None
+        self._still_fallback = None
+        self._still_texture = None
+        if callback is not None:
+            callback(opened)
+
+
+class SyntheticFrameSource(FrameSource):
+    """合成画面来源（无相机环境下测试用）
+
+    预先生成一张比画面宽 PAN_PERIOD 像素的纹理，read() 每帧返回平移
+    一段后的视图，不复制也不分配；画面内容由帧序号和 seed 决定，
+    可重复。照片按拍摄分辨率分条生成，不会先生成整张图。
+    """
+
+    name = 'synthetic'
+    PAN_PERIOD = 256
+    PAN_STEP = 8
+
+    def __init__(self, resolution, seed=0):
+        super().__init__()
+        self.resolution = tuple(resolution)
+        self.seed = seed
+        self.shots = 0
+        self._pattern = None
+        self._current = None
+
+    def open(self):
+        width, height = self.resolution
+        padded = width + self.PAN_PERIOD
+        rng = np.random.default_rng(self.seed)
+        x = np.arange(padded, dtype=np.uint32)[None, :]
+        y = np.arange(height, dtype=np.uint32)[:, None]
+
+        pattern = np.empty((height, padded, 4), dtype=np.uint8)
+        # 留出噪声的余量，避免uint8溢出
+        pattern[:, :, 0] = (x % self.PAN_PERIOD * 239 // (self.PAN_PERIOD - 1)).astype(np.uint8)
+        pattern[:, :, 1] = (y * 239 // max(height - 1, 1)).astype(np.uint8)
+        pattern[:, :, 2] = ((x // 64 + y // 64) % 2 * 96 + 64).astype(np.uint8)
+        pattern[:, :, :3] += rng.integers(0, 16, size=(height, padded, 1), dtype=np.uint8)
+        pattern[:, :, 3] = 255
+        self._pattern = pattern
+        return True
+
+    def close(self):
+        self._pattern = None
+        self._current = None
+
+    def read(self):
+        if self._pattern is None:
+            return None
+        shift = self.frames_read * self.PAN_STEP % self.PAN_PERIOD
+        self.frames_read += 1
+        self._current = self._pattern[:, shift:shift + self.resolution[0]]
+        return self._current
+
+    def peek(self):
+        return self._current if self._current is not None else self.read()
+
+    def open_still(self, resolution):
+        width, height = resolution
+        self.shots += 1
+        shift = self.shots * 37 + self.seed
+        x = np.arange(width, dtype=np.uint32)
+
+        def read_rows(y0, y1, out):
+            y = np.arange(y0, y1, dtype=np.uint32)[:, None]
+            out[:, :, 0] = (x * 255 // max(width - 1, 1)).astype(np.uint8)
+            out[:, :, 1] = (y * 255 // max(height - 1, 1)).astype(np.uint8)
+            out[:, :, 2] = (((x + shift) // 64 + y // 64) % 2 * 96 + 64).astype(np.uint8)
+
+        return width, height, read_rows
+
+
+class ReplayFrameSource(FrameSource):
+    """回放来源 - 内存映射 FrameRecorder 录制的文件
+
+    read() 按顺序返回映射区上的只读视图，不复制，像素按需从页缓存
+    读入；每次回放的帧序列与录制时相同，与回放时机无关。文件头的
+    帧数为0（录制中断）时按文件大小推算。
+    """
+
+    name = 'replay'
+
+    def __init__(self, path, loop=True):
+        super().__init__()
+        self.path = path
+        self.loop = loop
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+        self.frames = None
+        self._index = 0
+        self._current = None
+
+    @property
+    def frame_count(self):
+        """文件中的帧数"""
+        return len(self.frames) if self.frames is not None else 0
+
+    def open(self):
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(FRAME_FILE_HEADER.size)
+            if len(header) < FRAME_FILE_HEADER.size:
+                raise ValueError("文件头不完整")
+
+            magic, version, width, height, count, fps = FRAME_FILE_HEADER.unpack(header)
+            if magic != FRAME_FILE_MAGIC or version != FRAME_FILE_VERSION:
+                raise ValueError("不是帧录制文件")
+
+            frame_size = width * height * 4
+            if frame_size == 0:
+                raise ValueError("画面尺寸为0")
+            available = (os.path.getsize(self.path) - FRAME_FILE_HEADER.size) // frame_size
+            if count == 0 or count > available:
+                count = available
+            if count == 0:
+                raise ValueError("文件中没有完整的帧")
+
+            self.frames = np.memmap(
+                self.path, dtype=np.uint8, mode='r',
+                offset=FRAME_FILE_HEADER.size, shape=(count, height, width, 4)
+            )
+            self.width, self.height, self.fps = width, height, fps
+            self._index = 0
+            Logger.info(
+                f"ReplayFrameSource: 打开回放文件 {self.path}，"
+                f"{count} 帧 {width}x{height}"
+            )
+            return True
+        except Exception as e:
+            Logger.error(f"ReplayFrameSource: 打开回放文件失败: {e}")
+            return False
+
+    def close(self):
+        # 释放映射（视图仍被引用时由GC在最后一个视图释放后解除）
+        self.frames = None
+        self._current = None
+
+    def read(self):
+        if self.frames is None:
+            return None
+        if self._index >= len(self.frames):
+            if not self.loop:
+                return None
+            self._index = 0
+
+        self._current = self.frames[self._index]
+        self._index += 1
+        self.frames_read += 1
+        return self._current
+
+    def peek(self):
+        return self._current if self._current is not None else self.read()
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['position'] = self._index
+        stats['frame_count'] = self.frame_count
+        return stats
+
+
+class FrameRecorder:
+    """帧录制器 - 把采集到的帧追加写入回放文件
+
+    write() 在UI线程只把帧复制到预分配的槽位并放入队列，写盘在后台
+    线程进行；槽位用完（磁盘跟不上）时丢弃这一帧并计数，不阻塞取帧。
+    第一帧到达时按其尺寸写文件头。close() 只投递结束标记、不等待，
+    写入线程写完队列中的帧后回写帧数并退出；需要立即读取文件时调用
+    join()。达到 max_frames、分辨率变化或写盘出错时停止录制，已写入
+    的部分仍可回放。
+    """
+
+    def __init__(self, path, fps=0.0, max_frames=600, max_queue=4):
+        self.path = path
+        self.fps = fps
+        self.max_frames = max_frames
+        self.max_queue = max(1, max_queue)
+        self.width = 0
+        self.height = 0
+        self._file = None
+        self._stopped = False
+        self._closing = False
+        self._accepted = 0
+        self._free = queue.Queue()
+        self._queue = queue.Queue()
+        self._thread = None
+
+        # 统计
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.bytes_written = 0
+
+    @property
+    def active(self):
+        """是否仍在录制"""
+        return not self._stopped
+
+    def write(self, rgba):
+        """复制一帧 (高, 宽, 4) 的RGBA数组到写入队列（不阻塞），返回是否已接收"""
+        if self._stopped:
+            return False
+
+        height, width = rgba.shape[:2]
+        if self._thread is None:
+            self._start(width, height)
+        elif (width, height) != (self.width, self.height):
+            Logger.warning("FrameRecorder: 分辨率变化，停止录制")
+            self.close()
+            return False
+
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            self.frames_dropped += 1
+            return False
+
+        np.copyto(slot, rgba)
+        self._queue.put(slot)
+        self._accepted += 1
+
+        if self._accepted >= self.max_frames:
+            Logger.info(f"FrameRecorder: 已录满 {self.max_frames} 帧，停止录制")
+            self.close()
+        return True
+
+    def close(self):
+        """结束录制（不阻塞）：投递结束标记，写入线程写完剩余帧后回写帧数"""
+        self._stopped = True
+        if self._thread is None or self._closing:
+            return
+        self._closing = True
+        self._queue.put(None)
+
+    def join(self, timeout=None):
+        """等待写入线程结束，返回是否已结束"""
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'path': self.path,
+            'active': self.active,
+            'frames_written': self.frames_written,
+            'frames_dropped': self.frames_dropped,
+            'bytes_written': self.bytes_written,
+        }
+
+    def _start(self, width, height):
+        """按第一帧的尺寸分配槽位并启动写入线程"""
+        self.width, self.height = width, height
+        for _ in range(self.max_queue):
+            self._free.put(np.empty((height, width, 4), dtype=np.uint8))
+        # 不是守护线程，应用退出时队列中的帧会写完
+        self._thread = threading.Thread(
+            target=self._run,
+            name='FrameRecorder'
+        )
+        self._thread.start()
+
+    def _run(self):
+        """写入线程：打开文件，逐帧写入，收到结束标记后回写帧数"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'wb')
+            self._file.write(self._header(0))
+            Logger.info(
+                f"FrameRecorder: 开始录制 {self.width}x{self.height} -> {self.path}"
+            )
+        except Exception as e:
+            Logger.error(f"FrameRecorder: 创建录制文件失败: {e}")
+            self._stopped = True
+            self._file = None
+            return
+
+        while True:
+            slot = self._queue.get()
+            if slot is None:
+                break
+            try:
+                data = memoryview(slot).cast('B')
+                self._file.write(data)
+                self.frames_written += 1
+                self.bytes_written += len(data)
+            except Exception as e:
+                # 出错后直接退出，不再等待结束标记
+                Logger.error(f"FrameRecorder: 写入帧失败: {e}")
+                self._stopped = True
+                break
+            self._free.put(slot)
+
+        self._finish()
+
+    def _finish(self):
+        """回写帧数并关闭文件（写入线程调用）"""
+        if self._file is None:
+            return
+        try:
+            self._file.seek(0)
+            self._file.write(self._header(self.frames_written))
+            self._file.close()
+            Logger.info(
+                f"FrameRecorder: 录制完成 {self.frames_written} 帧，"
+                f"丢弃 {self.frames_dropped} 帧，"
+                f"{self.bytes_written / 1024 / 1024:.1f}MB"
+            )
+        except Exception as e:
+            Logger.error(f"FrameRecorder: 结束录制失败: {e}")
+        finally:
+            self._file = None
+
+    def _header(self, count):
+        return FRAME_FILE_HEADER.pack(
+            FRAME_FILE_MAGIC, FRAME_FILE_VERSION,
+            self.width, self.height, count, float(self.fps)
+        )
+
+
+def create_frame_source(camera_config):
+    """按 camera.frame_source 配置创建帧来源（kivy/synthetic/replay）"""
+    kind = camera_config.get('frame_source', 'kivy')
+    resolution = camera_config.get('preview_resolution', [1280, 720])
+
+    if kind == 'synthetic':
+        return SyntheticFrameSource(resolution)
+    if kind == 'replay':
+        return ReplayFrameSource(
+            camera_config.get('replay_path', ''),
+            loop=camera_config.get('replay_loop', True)
+        )
+    if kind != 'kivy':
+        Logger.warning(f"FrameSource: 未知的帧来源 {kind}，使用Kivy相机")
+    return KivyCameraSource(
+        resolution, still_timeout=camera_config.get('still_timeout', 2.0)
+    )
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+分析帧率控制模块 - 根据实测耗时自适应调整分析帧率
+"""
+
+import time
+
+
+class AdaptiveRateController:
+    """自适应分析帧率控制器
+
+    记录帧捕获耗时（UI线程）、分析耗时（工作线程）和UI帧间隔，
+    用指数滑动平均平滑后，按 CPU 预算计算可承受的分析帧率：
+
+        帧率 = cpu_budget / (捕获耗时 + 分析耗时)
+
+    UI帧间隔超出目标时再按比例降低。帧率已降到下限仍超预算时，
+    缩小分析代理宽度；余量充足时逐步恢复。
+    """
+
+    SMOOTHING = 0.2
+    # 帧率相对变化小于该比例时不调整，避免频繁重排定时器
+    HYSTERESIS = 0.15
+
+    def __init__(self, config):
+        analysis_config = config.get('local_analysis', {})
+        self.enabled = analysis_config.get('adaptive_rate', True)
+        self.min_fps = analysis_config.get('min_fps', 1)
+        self.max_fps = analysis_config.get('max_fps', 8)
+        self.cpu_budget = analysis_config.get('cpu_budget', 0.3)
+        self.target_frame_time = 1.0 / analysis_config.get('target_ui_fps', 30)
+        self.adjust_interval = analysis_config.get('rate_adjust_interval', 1.0)
+        self.max_proxy_width = analysis_config.get('proxy_width', 320)
+        self.min_proxy_width = analysis_config.get('min_proxy_width', 160)
+
+        initial_fps = analysis_config.get('analysis_fps', 2)
+        self.fps = min(max(initial_fps, self.min_fps), self.max_fps)
+        self.proxy_width = self.max_proxy_width
+
+        # 变化回调 on_change(fps, proxy_width)
+        self.on_change = None
+
+        self._capture_time = 0.0
+        self._analysis_time = 0.0
+        self._frame_time = 0.0
+        self._last_adjust = time.monotonic()
+        self._ticks = 0
+        self.effective_fps = 0.0
+
+    def record_capture(self, seconds):
+        """记录一次帧捕获耗时"""
+        self._capture_time = self._smooth(self._capture_time, seconds)
+
+    def record_analysis(self, seconds):
+        """记录一次分析耗时（可在工作线程调用）"""
+        self._analysis_time = self._smooth(self._analysis_time, seconds)
+
+    def record_frame_time(self, seconds):
+        """记录UI帧间隔"""
+        if seconds > 0:
+            self._frame_time = self._smooth(self._frame_time, seconds)
+
+    def tick(self):
+        """每个捕获周期调用一次，到达调整间隔时重新计算帧率
+
+        帧率或代理宽度变化时返回True。
+        """
+        self._ticks += 1
+        now = time.monotonic()
+        elapsed = now - self._last_adjust
+        if elapsed < self.adjust_interval:
+            return False
+
+        self.effective_fps = self._ticks / elapsed
+        self._ticks = 0
+        self._last_adjust = now
+
+        if not self.enabled:
+            return False
+        return self._adjust()
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'target_fps': self.fps,
+            'effective_fps': self.effective_fps,
+            'proxy_width': self.proxy_width,
+            'capture_ms': self._capture_time * 1000,
+            'analysis_ms': self._analysis_time * 1000,
+            'frame_ms': self._frame_time * 1000,
+        }
+
+    def _adjust(self):
+        """重新计算帧率和代理宽度"""
+        cost = self._capture_time + self._analysis_time
+        if cost <= 0:
+            return False
+
+        fps = self.cpu_budget / cost
+
+        # UI掉帧时按超出比例降低分析帧率
+        if self._frame_time > self.target_frame_time:
+            fps *= self.target_frame_time / self._frame_time
+
+        proxy_width = self.proxy_width
+        if fps < self.min_fps and proxy_width > self.min_proxy_width:
+            proxy_width = max(self.min_proxy_width, proxy_width // 2)
+        elif fps > self.max_fps * 2 and proxy_width < self.max_proxy_width:
+            proxy_width = min(self.max_proxy_width, proxy_width * 2)
+
+        fps = min(max(fps, self.min_fps), self.max_fps)
+
+        changed = proxy_width != self.proxy_width
+        if abs(fps - self.fps) > self.fps * self.HYSTERESIS:
+            self.fps = round(fps, 1)
+            changed = True
+        self.proxy_width = proxy_width
+
+        if changed and self.on_change:
+            self.on_change(self.fps, self.proxy_width)
+        return changed
+
+    def _smooth(self, current, sample):
+        """指数滑动平均"""
+        if current <= 0:
+            return sample
+        return current + self.SMOOTHING * (sample - current)
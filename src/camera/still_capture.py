@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+照片拍摄模块 - 按拍摄分辨率分条读取照片，预览和分析不受影响
+"""
+
+import threading
+import time
+
+import numpy as np
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from src.diagnostics import tracing
+
+
+class StillCapturePipeline:
+    """照片拍摄流水线
+
+    与预览使用不同的缓冲区：capture() 在UI线程通过帧来源的
+    request_still() 按 resolution 请求画面后立即返回（Kivy相机需要
+    短暂重新打开摄像头，画面就绪后才回调），分条复制/生成在工作线程
+    进行。输出写入预分配的照片缓冲区，最多 buffer_count 块，使用者
+    用完后调用 release() 归还；缓冲区都在使用中时拒绝拍摄。峰值内存为 buffer_count 张照片加一个分条。
+    """
+
+    def __init__(self, source, resolution, strip_rows=256, buffer_count=2):
+        self.source = source
+        self.resolution = tuple(resolution)
+        self.strip_rows = strip_rows
+        self.buffer_count = buffer_count
+
+        self._lock = threading.Lock()
+        self._free = []
+        self._lent = set()
+
+        # 统计
+        self.captures = 0
+        self.rejected = 0
+        self.failed = 0
+        self.last_latency = None
+
+    def capture(self, callback):
+        """拍摄一张照片（UI线程调用，不阻塞）
+
+        完成后在UI线程调用 callback(photo)，photo 为 (高, 宽, 3) 的RGB
+        数组，失败时为None。返回是否已开始拍摄。
+        """
+        start = time.perf_counter()
+        try:
+            return self.source.request_still(
+                self.resolution, lambda opened: self._start_fill(opened, callback, start)
+            )
+        except Exception as e:
+            self.failed += 1
+            Logger.error(f"StillCapturePipeline: 读取画面失败: {e}")
+            return False
+
+    def _start_fill(self, opened, callback, start):
+        """帧来源给出画面后（UI线程）分配缓冲区并启动分条复制"""
+        if opened is None:
+            self.failed += 1
+            Clock.schedule_once(lambda dt: callback(None), 0)
+            return
+
+        width, height, read_rows = opened
+        buffer = self._acquire(width, height)
+        if buffer is None:
+            self.rejected += 1
+            Logger.warning("StillCapturePipeline: 照片缓冲区都在使用中，跳过拍摄")
+            Clock.schedule_once(lambda dt: callback(None), 0)
+            return
+
+        thread = threading.Thread(
+            target=self._fill,
+            args=(buffer, read_rows, callback, start),
+            name='StillCapture',
+            daemon=True
+        )
+        thread.start()
+
+    def release(self, buffer):
+        """归还照片缓冲区（任意线程）"""
+        with self._lock:
+            if id(buffer) not in self._lent:
+                return
+            self._lent.discard(id(buffer))
+            self._free.append(buffer)
+
+    @property
+    def in_use(self):
+        """使用中的照片缓冲区数"""
+        with self._lock:
+            return len(self._lent)
+
+    def get_stats(self):
+        """获取统计信息"""
+        with self._lock:
+            buffers_in_use = len(self._lent)
+            buffers_free = len(self._free)
+        return {
+            'captures': self.captures,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'buffers_in_use': buffers_in_use,
+            'buffers_free': buffers_free,
+            'last_latency_ms': (self.last_latency * 1000
+                                if self.last_latency is not None else None),
+        }
+
+    def _acquire(self, width, height):
+        """取一块空闲缓冲区，尺寸变化时丢弃旧尺寸的空闲缓冲区"""
+        shape = (height, width, 3)
+        with self._lock:
+            for i, buffer in enumerate(self._free):
+                if buffer.shape == shape:
+                    buffer = self._free.pop(i)
+                    self._lent.add(id(buffer))
+                    return buffer
+
+            self._free = []
+            if len(self._lent) >= self.buffer_count:
+                return None
+
+            # np.empty 不初始化内存，分配本身很快
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._lent.add(id(buffer))
+            return buffer
+
+    def _fill(self, buffer, read_rows, callback, start):
+        """工作线程：分条写入照片缓冲区"""
+        height = buffer.shape[0]
+        try:
+            with tracing.span('still.fill'):
+                for y0 in range(0, height, self.strip_rows):
+                    y1 = min(y0 + self.strip_rows, height)
+                    read_rows(y0, y1, buffer[y0:y1])
+        except Exception as e:
+            self.failed += 1
+            self.release(buffer)
+            Logger.error(f"StillCapturePipeline: 拍摄失败: {e}")
+            Clock.schedule_once(lambda dt: callback(None), 0)
+            return
+
+        self.captures += 1
+        self.last_latency = time.perf_counter() - start
+        Logger.info(
+            f"StillCapturePipeline: 照片拍摄完成 {buffer.shape[1]}x{height}，"
+            f"耗时 {self.last_latency * 1000:.0f}ms"
+        )
+        Clock.schedule_once(lambda dt: callback(buffer), 0)
@@ -3,105 +3,220 @@
 网格叠加层模块 - 绘制构图辅助线
 """
 
-from kivy.graphics import Color, Line, Rectangle
+import time
+
+from kivy.graphics import Color, InstructionGroup, Line
 from kivy.logger import Logger
 
+from src.composition.subject_renderer import SubjectMeshRenderer
+from src.config_store import watch
+from src.diagnostics import metrics, tracing
+
+
+GOLDEN_RATIO = 0.618
+
 
 class GridOverlay:
-    """网格叠加层"""
-    
+    """网格叠加层
+
+    绘制指令只在 attach() 时创建一次，按图层组织为 InstructionGroup：
+    - 尺寸变化时只修改已有 Line 的 points
+    - 开关变化时把图层移出或放回根分组，不重建指令
+    - 主体框、十字标记和置信度条由 SubjectMeshRenderer 合并为一个Mesh
+    画面和主体都没有变化时，draw_all() 不做任何图形操作。
+    """
+
+    # 图层绘制顺序（主体框在最上面）
+    LAYERS = ('thirds', 'golden', 'horizon', 'subject')
+
     def __init__(self, config):
-        self.config = config.get('ui', {})
-        self.grid_color = self.config.get('grid_color', [255, 255, 255, 128])
-        
-        # 归一化颜色值
-        self.grid_color = [c / 255.0 for c in self.grid_color]
-        
+        self.canvas = None
+        self.root = None
+        self.groups = {}
+        self.size = None
+        self.subjects = []
+        self.subject_renderer = None
+        self.max_subjects = config.get('ui', {}).get('max_subjects', 8)
+        self.color_instructions = {}
+
+        # 统计
+        self.builds = 0
+        self.layout_updates = 0
+        self.visibility_updates = 0
+        self._update_metric = metrics.histogram('overlay.update_ms')
+
+        # 显示开关和颜色缓存为属性，设置变化时由配置存储通知更新
+        watch(config, 'ui', 'show_grid', self._visibility_setter('show_grid'), True)
+        watch(config, 'ui', 'show_golden_ratio',
+              self._visibility_setter('show_golden_ratio'), True)
+        watch(config, 'ui', 'show_horizon', self._visibility_setter('show_horizon'), True)
+        watch(config, 'ui', 'show_subject_box',
+              self._visibility_setter('show_subject_box'), True)
+        watch(config, 'ui', 'grid_color', self._color_setter('grid_color'),
+              [255, 255, 255, 128])
+        watch(config, 'ui', 'subject_box_color', self._color_setter('subject_box_color'),
+              [255, 0, 0, 200])
+
         Logger.info("GridOverlay: 初始化网格叠加层")
-    
-    def draw_rule_of_thirds(self, canvas, width, height):
-        """绘制三分法网格"""
-        if not self.config.get('show_grid', True):
-            return
-        
-        with canvas:
-            Color(*self.grid_color)
-            
-            # 垂直线
-            third_w = width / 3
-            Line(points=[third_w, 0, third_w, height], width=1.5)
-            Line(points=[2 * third_w, 0, 2 * third_w, height], width=1.5)
-            
-            # 水平线
-            third_h = height / 3
-            Line(points=[0, third_h, width, third_h], width=1.5)
-            Line(points=[0, 2 * third_h, width, 2 * third_h], width=1.5)
-    
-    def draw_golden_ratio(self, canvas, width, height):
-        """绘制黄金分割线"""
-        if not self.config.get('show_golden_ratio', True):
+
+    def _visibility_setter(self, name):
+        """生成开关更新回调"""
+        def setter(value):
+            setattr(self, name, value)
+            self._sync_visibility()
+        return setter
+
+    def _color_setter(self, name):
+        """生成颜色更新回调（归一化到0-1，直接修改已有Color）"""
+        def setter(value):
+            rgba = [c / 255.0 for c in value]
+            setattr(self, name, rgba)
+            for color in self.color_instructions.get(name, ()):
+                color.rgba = rgba
+        return setter
+
+    def attach(self, canvas):
+        """在画布上创建辅助线指令（只创建一次，重复调用无操作）"""
+        if canvas is self.canvas:
             return
-        
-        golden_ratio = 0.618
-        
-        with canvas:
-            Color(*self.grid_color)
-            
-            # 垂直黄金分割线
-            golden_w = width * golden_ratio
-            Line(points=[golden_w, 0, golden_w, height], width=1.2, dash_length=5, dash_offset=2)
-            
-            # 水平黄金分割线
-            golden_h = height * golden_ratio
-            Line(points=[0, golden_h, width, golden_h], width=1.2, dash_length=5, dash_offset=2)
-    
-    def draw_horizon_line(self, canvas, width, height):
-        """绘制水平参考线"""
-        if not self.config.get('show_horizon', True):
+        self.detach()
+
+        grid_colors = [Color(*self.grid_color), Color(*self.grid_color)]
+        self.subject_renderer = SubjectMeshRenderer(
+            self.max_subjects, self.subject_box_color
+        )
+        self.color_instructions = {
+            'grid_color': grid_colors,
+            'subject_box_color': [self.subject_renderer.color],
+        }
+
+        # 三分法网格
+        thirds = InstructionGroup()
+        thirds.add(grid_colors[0])
+        self.thirds_lines = [Line(points=[0, 0, 0, 0], width=1.5) for _ in range(4)]
+        for line in self.thirds_lines:
+            thirds.add(line)
+
+        # 黄金分割线（与网格同色）
+        golden = InstructionGroup()
+        golden.add(grid_colors[1])
+        self.golden_lines = [
+            Line(points=[0, 0, 0, 0], width=1.2, dash_length=5, dash_offset=2)
+            for _ in range(2)
+        ]
+        for line in self.golden_lines:
+            golden.add(line)
+
+        # 水平参考线（黄色）
+        horizon = InstructionGroup()
+        horizon.add(Color(1, 1, 0, 0.5))
+        self.horizon_line = Line(points=[0, 0, 0, 0], width=1, dash_length=10, dash_offset=5)
+        horizon.add(self.horizon_line)
+
+        self.groups = {
+            'thirds': thirds,
+            'golden': golden,
+            'horizon': horizon,
+            'subject': self.subject_renderer.group,
+        }
+        self.root = InstructionGroup()
+        self.canvas = canvas
+        canvas.add(self.root)
+        self.builds += 1
+
+        self.size = None
+        self._apply_subjects()
+        self._sync_visibility()
+
+    def detach(self):
+        """从画布移除辅助线"""
+        if self.canvas is not None and self.root is not None:
+            self.canvas.remove(self.root)
+        self.canvas = None
+        self.root = None
+        self.groups = {}
+        self.subject_renderer = None
+        self.color_instructions = {}
+        self.size = None
+
+    def update_layout(self, width, height):
+        """尺寸变化时更新线的坐标"""
+        if self.root is None or self.size == (width, height):
             return
-        
-        with canvas:
-            Color(1, 1, 0, 0.5)  # 黄色
-            
-            # 中心水平线
-            center_h = height / 2
-            Line(points=[0, center_h, width, center_h], width=1, dash_length=10, dash_offset=5)
-    
-    def draw_subject_box(self, canvas, subject_info):
-        """绘制主体框"""
-        if not self.config.get('show_subject_box', True) or not subject_info:
+        self.size = (width, height)
+        self.layout_updates += 1
+
+        third_w = width / 3
+        third_h = height / 3
+        self.thirds_lines[0].points = [third_w, 0, third_w, height]
+        self.thirds_lines[1].points = [2 * third_w, 0, 2 * third_w, height]
+        self.thirds_lines[2].points = [0, third_h, width, third_h]
+        self.thirds_lines[3].points = [0, 2 * third_h, width, 2 * third_h]
+
+        golden_w = width * GOLDEN_RATIO
+        golden_h = height * GOLDEN_RATIO
+        self.golden_lines[0].points = [golden_w, 0, golden_w, height]
+        self.golden_lines[1].points = [0, golden_h, width, golden_h]
+
+        center_h = height / 2
+        self.horizon_line.points = [0, center_h, width, center_h]
+
+    def set_subject(self, subject_info):
+        """移动主体框，subject_info 为空时隐藏"""
+        self.set_subjects([subject_info] if subject_info else [])
+
+    def set_subjects(self, subjects):
+        """更新多个主体标记（与上次相同时不做任何图形操作）"""
+        start = time.perf_counter()
+        with tracing.span('overlay.set_subjects'):
+            self.subjects = list(subjects or ())
+            self._apply_subjects()
+            self._sync_visibility()
+        self._update_metric.observe((time.perf_counter() - start) * 1000)
+
+    def draw_all(self, canvas, width, height, subject_info=None):
+        """绘制所有辅助线（首次调用创建指令，之后只更新变化的部分）
+
+        subject_info 可以是单个主体字典或主体列表。
+        """
+        self.attach(canvas)
+        self.update_layout(width, height)
+        if isinstance(subject_info, (list, tuple)):
+            self.set_subjects(subject_info)
+        else:
+            self.set_subject(subject_info)
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'builds': self.builds,
+            'layout_updates': self.layout_updates,
+            'subject_updates': (self.subject_renderer.updates
+                                if self.subject_renderer is not None else 0),
+            'visibility_updates': self.visibility_updates,
+        }
+
+    def _apply_subjects(self):
+        """把当前主体写入批量渲染器"""
+        if self.subject_renderer is not None:
+            self.subject_renderer.update(self.subjects)
+
+    def _sync_visibility(self):
+        """按开关状态调整根分组中的图层（只在变化时操作）"""
+        if self.root is None:
             return
-        
-        bbox = subject_info.get('bbox')
-        if not bbox:
+
+        visible = {
+            'thirds': self.show_grid,
+            'golden': self.show_golden_ratio,
+            'horizon': self.show_horizon,
+            'subject': self.show_subject_box and self.subject_renderer.count > 0,
+        }
+        wanted = [self.groups[name] for name in self.LAYERS if visible[name]]
+        if wanted == self.root.children:
             return
-        
-        x, y, w, h = bbox
-        box_color = self.config.get('subject_box_color', [255, 0, 0, 200])
-        box_color = [c / 255.0 for c in box_color]
-        
-        with canvas:
-            Color(*box_color)
-            
-            # 绘制矩形框
-            Line(rectangle=(x, y, w, h), width=2)
-            
-            # 绘制中心点
-            center = subject_info.get('center')
-            if center:
-                cx, cy = center
-                # 绘制十字标记
-                cross_size = 10
-                Line(points=[cx - cross_size, cy, cx + cross_size, cy], width=2)
-                Line(points=[cx, cy - cross_size, cx, cy + cross_size], width=2)
-    
-    def draw_all(self, canvas, width, height, subject_info=None):
-        """绘制所有辅助线"""
-        canvas.clear()
-        
-        self.draw_rule_of_thirds(canvas, width, height)
-        self.draw_golden_ratio(canvas, width, height)
-        self.draw_horizon_line(canvas, width, height)
-        
-        if subject_info:
-            self.draw_subject_box(canvas, subject_info)
+
+        self.root.clear()
+        for group in wanted:
+            self.root.add(group)
+        self.visibility_updates += 1
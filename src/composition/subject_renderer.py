@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+主体标记渲染模块 - 用一个Mesh批量绘制多个主体框、十字标记和置信度条
+"""
+
+import numpy as np
+from kivy.graphics import Color, InstructionGroup, Mesh
+from kivy.logger import Logger
+
+
+# 每个主体：矩形框4个顶点、十字标记4个顶点、置信度条2个顶点
+VERTICES_PER_SUBJECT = 10
+# 每个顶点 x, y, u, v（Mesh默认顶点格式）
+FLOATS_PER_VERTEX = 4
+# 矩形4条边、十字2条线、置信度条1条线
+SUBJECT_INDICES = (0, 1, 1, 2, 2, 3, 3, 0, 4, 5, 6, 7, 8, 9)
+
+CROSS_SIZE = 10
+BAR_OFFSET = 6
+
+
+class SubjectMeshRenderer:
+    """多主体标记渲染器
+
+    所有主体的线段都放在一个预分配的 float32 顶点数组里，以 'lines'
+    模式的单个 Mesh 绘制，绘制调用数与主体数量无关。索引在创建时按
+    max_subjects 一次生成；未使用的槽位顶点全部置零（零长度线段不
+    产生像素），因此每帧只需原地改写顶点并重新提交同一块内存。
+    """
+
+    def __init__(self, max_subjects=8, color=(1, 0, 0, 0.8)):
+        self.max_subjects = max_subjects
+
+        self.vertices = np.zeros(
+            (max_subjects, VERTICES_PER_SUBJECT, FLOATS_PER_VERTEX), dtype=np.float32
+        )
+        self._vertex_view = memoryview(self.vertices.reshape(-1))
+        offsets = np.arange(max_subjects, dtype=np.int32)[:, None] * VERTICES_PER_SUBJECT
+        indices = (offsets + np.array(SUBJECT_INDICES, dtype=np.int32)).reshape(-1)
+
+        self.color = Color(*color)
+        self.mesh = Mesh(
+            vertices=self._vertex_view,
+            indices=indices.tolist(),
+            mode='lines'
+        )
+        self.group = InstructionGroup()
+        self.group.add(self.color)
+        self.group.add(self.mesh)
+
+        self.count = 0
+        self._subjects = None
+
+        # 统计
+        self.updates = 0
+
+        Logger.info(f"SubjectMeshRenderer: 初始化，最多 {max_subjects} 个主体")
+
+    def update(self, subjects):
+        """更新主体标记
+
+        subjects 为字典列表，包含 'bbox' (x, y, w, h)，可选 'center'
+        和 'confidence' (0-1)。超过 max_subjects 时保留置信度最高的。
+        与上次相同则不做任何操作。返回实际绘制的主体数。
+        """
+        subjects = [s for s in (subjects or ()) if s.get('bbox')]
+        if len(subjects) > self.max_subjects:
+            subjects = sorted(
+                subjects, key=lambda s: s.get('confidence', 1.0), reverse=True
+            )[:self.max_subjects]
+
+        key = [
+            (tuple(s['bbox']), tuple(s['center']) if s.get('center') else None,
+             s.get('confidence', 1.0))
+            for s in subjects
+        ]
+        if key == self._subjects:
+            return self.count
+        self._subjects = key
+
+        n = len(key)
+        data = self.vertices
+        if n:
+            boxes = np.array([item[0] for item in key], dtype=np.float32)
+            x, y, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+            centers = np.array(
+                [item[1] if item[1] is not None else (0.0, 0.0) for item in key],
+                dtype=np.float32
+            )
+            has_center = np.array([item[1] is not None for item in key])
+            confidence = np.clip(
+                np.array([item[2] for item in key], dtype=np.float32), 0.0, 1.0
+            )
+
+            # 矩形框
+            data[:n, 0, 0], data[:n, 0, 1] = x, y
+            data[:n, 1, 0], data[:n, 1, 1] = x + w, y
+            data[:n, 2, 0], data[:n, 2, 1] = x + w, y + h
+            data[:n, 3, 0], data[:n, 3, 1] = x, y + h
+
+            # 十字标记（没有中心点的主体退化为零长度线段）
+            cx = centers[:, 0]
+            cy = centers[:, 1]
+            size = np.where(has_center, CROSS_SIZE, 0).astype(np.float32)
+            data[:n, 4, 0], data[:n, 4, 1] = cx - size, cy
+            data[:n, 5, 0], data[:n, 5, 1] = cx + size, cy
+            data[:n, 6, 0], data[:n, 6, 1] = cx, cy - size
+            data[:n, 7, 0], data[:n, 7, 1] = cx, cy + size
+
+            # 置信度条（框上方，长度按置信度比例）
+            bar_y = y + h + BAR_OFFSET
+            data[:n, 8, 0], data[:n, 8, 1] = x, bar_y
+            data[:n, 9, 0], data[:n, 9, 1] = x + w * confidence, bar_y
+
+        # 上次使用、这次空出的槽位清零
+        if self.count > n:
+            data[n:self.count] = 0
+
+        self.count = n
+        self.mesh.vertices = self._vertex_view
+        self.updates += 1
+        return n
+
+    def clear(self):
+        """隐藏所有标记"""
+        self.update(None)
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'subjects': self.count,
+            'max_subjects': self.max_subjects,
+            'updates': self.updates,
+        }
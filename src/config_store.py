@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+配置存储模块 - 按类型解析的配置、变更通知和延迟写盘
+"""
+
+import copy
+import json
+import os
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+
+# 默认配置（同时作为类型定义：读取和修改时按默认值的类型转换）
+DEFAULTS = {
+    'tencent_cloud': {
+        'api_key': '',
+        'api_secret': '',
+        'enabled': False,
+        'endpoint': 'https://tiia.tencentcloudapi.com',
+        'region': 'ap-guangzhou',
+        'mock_mode': True,
+        'max_workers': 2,
+        'upload_max_kb': 500,
+        'cache_enabled': True,
+    },
+    'local_analysis': {
+        'enabled': True,
+        'analysis_fps': 2,
+        'proxy_width': 320,
+        'change_gating': True,
+        'change_threshold': 3.0,
+        'adaptive_rate': True,
+        'cpu_budget': 0.3,
+    },
+    'camera': {
+        'preview_resolution': [1280, 720],
+        'capture_resolution': [4000, 3000],
+        'auto_focus': True,
+        'frame_pool_size': 3,
+        'frame_source': 'kivy',
+        'replay_path': '',
+        'replay_loop': True,
+        'record_session': False,
+        'record_dir': 'recordings',
+        'record_max_frames': 600,
+        'still_strip_rows': 256,
+        'still_buffers': 2,
+        'still_timeout': 2.0,
+        'burst_mode': False,
+        'burst_frames': 5,
+        'burst_fps': 15,
+        'burst_window': 0.3,
+    },
+    'storage': {
+        'output_dir': 'photos',
+        'format': 'JPEG',
+        'quality': 92,
+        'max_queue': 4,
+    },
+    'ui': {
+        'show_grid': True,
+        'show_golden_ratio': True,
+        'show_horizon': True,
+        'show_subject_box': True,
+        'show_local_score': True,
+        'max_subjects': 8,
+        'grid_color': [255, 255, 255, 128],
+        'subject_box_color': [255, 0, 0, 200],
+        'show_perf_hud': False,
+    },
+    'diagnostics': {
+        'metrics_enabled': False,
+        'snapshot_path': 'data/metrics.json',
+        'snapshot_interval': 0,
+        'trace_enabled': False,
+        'trace_capacity': 20000,
+        'trace_path': 'data/trace.json',
+    },
+    'api_usage': {
+        'monthly_limit': 10000,
+        'reset_date': '',
+    },
+}
+
+
+def coerce_value(value, default):
+    """按默认值的类型转换配置值，无法转换时返回默认值
+
+    默认值为整数时只接受整数值（2.0 -> 2），带小数的值（如 2.5）保留
+    为浮点数，不截断。
+    """
+    if default is None or value is None:
+        return value if value is not None else default
+    try:
+        if isinstance(default, bool):
+            if isinstance(value, str):
+                return value.strip().lower() in ('1', 'true', 'yes', 'on')
+            return bool(value)
+        if isinstance(default, int):
+            if isinstance(value, str):
+                value = float(value.strip())
+            if isinstance(value, float) and not value.is_integer():
+                return value
+            return int(value)
+        if isinstance(default, float):
+            return float(value)
+        if isinstance(default, list):
+            return list(value)
+        if isinstance(default, str):
+            return str(value)
+    except (TypeError, ValueError):
+        Logger.warning(f"ConfigStore: 配置值类型无效: {value!r}，使用默认值 {default!r}")
+        return default
+    return value
+
+
+def watch(config, section, key, callback, default=None):
+    """读取配置项并在变化时回调
+
+    立即以当前值（缺省时为 default）调用一次 callback(value)。
+    config 为 ConfigStore 时登记变更通知，普通字典只读取一次。组件
+    借此把用到的配置缓存为属性，绘制和分析路径上不再逐帧查字典。
+    """
+    callback(config.get(section, {}).get(key, default))
+    if isinstance(config, ConfigStore):
+        config.subscribe(section, key, callback)
+
+
+def ensure_store(config, path=None):
+    """返回 ConfigStore：已是 ConfigStore 时原样返回，普通字典按默认值
+    补全后包装为新的 ConfigStore，指定 path 时修改写入该文件
+
+    界面在创建屏幕处调用一次，所有屏幕共享同一个存储，设置页的修改
+    才能通知到相机页并保存。
+    """
+    if isinstance(config, ConfigStore):
+        return config
+    return ConfigStore.from_dict(config or {}, path=path)
+
+
+def set_value(config, section, key, value):
+    """修改配置项
+
+    config 应为 ConfigStore：转换类型、通知订阅者并延迟保存。普通字典
+    只能写入内存（不通知、不保存），会记录警告。返回值是否发生变化。
+    """
+    if isinstance(config, ConfigStore):
+        return config.set(section, key, value)
+    Logger.warning(
+        f"ConfigStore: 配置不是 ConfigStore，{section}.{key} 的修改不会保存也不会通知"
+    )
+    values = config.setdefault(section, {})
+    if values.get(key) == value:
+        return False
+    values[key] = value
+    return True
+
+
+class ConfigStore(dict):
+    """配置存储
+
+    以分节字典的形式兼容原有的 config.get('section', {}).get(key) 读法。
+    加载时按 DEFAULTS 补全缺省项并转换类型；通过 set() 修改时通知
+    订阅者，并在 save_delay 秒内合并多次修改只写一次文件，写入使用
+    临时文件 + 重命名，写到一半崩溃不会损坏原配置。
+    """
+
+    def __init__(self, path=None, defaults=None, save_delay=1.0):
+        super().__init__()
+        self.path = path
+        self.defaults = defaults if defaults is not None else DEFAULTS
+        self.save_delay = save_delay
+        self._subscribers = {}
+        self._save_trigger = Clock.create_trigger(self._save, save_delay)
+        self.dirty = False
+
+        # 统计
+        self.changes = 0
+        self.saves = 0
+
+        self._load()
+
+    @classmethod
+    def from_dict(cls, values, path=None, defaults=None, save_delay=1.0):
+        """由已有的配置字典创建（不读取文件），path 为之后的保存位置"""
+        store = cls(defaults=defaults, save_delay=save_delay)
+        store._merge(values)
+        store.path = path
+        return store
+
+    def value(self, section, key, default=None):
+        """读取单个配置项"""
+        return self.get(section, {}).get(key, default)
+
+    def set(self, section, key, value):
+        """修改配置项，值未变化时返回False"""
+        values = self.setdefault(section, {})
+        default = self.defaults.get(section, {}).get(key)
+        value = coerce_value(value, default)
+        if key in values and values[key] == value:
+            return False
+
+        values[key] = value
+        self.changes += 1
+        self.dirty = True
+        if self.path:
+            self._save_trigger()
+
+        for callback in self._subscribers.get((section, key), ()):
+            callback(value)
+        for callback in self._subscribers.get((section, None), ()):
+            callback(value)
+        return True
+
+    def subscribe(self, section, key, callback):
+        """订阅配置变化，key 为 None 时订阅整节"""
+        callbacks = self._subscribers.setdefault((section, key), [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    def unsubscribe(self, section, key, callback):
+        """取消订阅"""
+        callbacks = self._subscribers.get((section, key), [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def flush(self):
+        """立即写入未保存的修改（应用退出时调用）"""
+        self._save_trigger.cancel()
+        self._save()
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'changes': self.changes,
+            'saves': self.saves,
+            'dirty': self.dirty,
+        }
+
+    def _load(self):
+        """读取配置文件并按默认值补全、转换类型"""
+        data = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                Logger.info(f"ConfigStore: 已加载配置 {self.path}")
+            except Exception as e:
+                Logger.error(f"ConfigStore: 读取配置失败，使用默认配置: {e}")
+                data = {}
+        self._merge(data)
+
+    def _merge(self, data):
+        """按默认值补全、转换类型后写入各节"""
+        for section, defaults in self.defaults.items():
+            values = copy.deepcopy(defaults)
+            for key, value in data.get(section, {}).items():
+                values[key] = coerce_value(value, defaults.get(key))
+            self[section] = values
+
+        # 未在默认配置中定义的节原样保留
+        for section, values in data.items():
+            if section not in self:
+                self[section] = values
+
+    def _save(self, dt=None):
+        """写入配置文件（临时文件+重命名）"""
+        if not self.dirty or not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self.dirty = False
+            self.saves += 1
+            Logger.info(f"ConfigStore: 配置已保存 {self.path}")
+        except Exception as e:
+            Logger.error(f"ConfigStore: 保存配置失败: {e}")
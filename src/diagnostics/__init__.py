@@ -0,0 +1 @@
+# 诊断模块
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+性能指标模块 - 计数器、仪表和固定分桶直方图，关闭时几乎没有开销
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left
+
+from kivy.logger import Logger
+
+
+# 延迟直方图的默认分桶上界（毫秒），最后还有一个溢出桶
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Counter:
+    """计数器（只增不减）"""
+
+    def __init__(self, registry, name):
+        self._registry = registry
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount=1):
+        """增加计数"""
+        if self._registry.enabled:
+            self.value += amount
+
+    def reset(self):
+        """清零"""
+        self.value = 0
+
+
+class Gauge:
+    """仪表（记录当前值）"""
+
+    def __init__(self, registry, name):
+        self._registry = registry
+        self.name = name
+        self.value = None
+
+    def set(self, value):
+        """设置当前值"""
+        if self._registry.enabled:
+            self.value = value
+
+    def reset(self):
+        """清除当前值"""
+        self.value = None
+
+
+class Histogram:
+    """固定分桶直方图
+
+    observe() 只做一次二分查找和一次计数，不保存样本，内存固定；
+    分位数按桶上界估计，精度取决于分桶。
+    """
+
+    def __init__(self, registry, name, buckets=LATENCY_BUCKETS_MS):
+        self._registry = registry
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.reset()
+
+    def observe(self, value):
+        """记录一个样本"""
+        if not self._registry.enabled:
+            return
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """估计分位数（q 取 0-100），没有样本时返回None"""
+        if self.count == 0:
+            return None
+        target = self.count * q / 100.0
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def reset(self):
+        """清空所有桶"""
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def summary(self):
+        """汇总为字典"""
+        return {
+            'count': self.count,
+            'avg': self.sum / self.count if self.count else None,
+            'max': self.max if self.count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'buckets': [
+                [bound, count]
+                for bound, count in zip(self.buckets + ('inf',), self.counts)
+            ],
+        }
+
+
+class MetricsRegistry:
+    """指标注册表
+
+    组件在初始化时用 counter()/gauge()/histogram() 取得指标对象并
+    保存为属性，热路径上直接调用 inc()/set()/observe()。关闭时每次
+    调用只检查一次 enabled 就返回。指标在多个线程中更新时不加锁，
+    并发下可能少计极少量样本，统计用途可以接受。
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._metrics = {}
+        self.created_at = time.time()
+
+    def counter(self, name):
+        """获取或创建计数器"""
+        return self._get(name, Counter)
+
+    def gauge(self, name):
+        """获取或创建仪表"""
+        return self._get(name, Gauge)
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS_MS):
+        """获取或创建直方图"""
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = Histogram(self, name, buckets)
+            self._metrics[name] = metric
+        return metric
+
+    def get(self, name):
+        """按名称查找指标，不存在时返回None"""
+        return self._metrics.get(name)
+
+    def reset(self):
+        """清零所有指标"""
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def snapshot(self):
+        """当前所有指标的快照"""
+        counters = {}
+        gauges = {}
+        histograms = {}
+        for name, metric in sorted(self._metrics.items()):
+            if isinstance(metric, Counter):
+                counters[name] = metric.value
+            elif isinstance(metric, Gauge):
+                gauges[name] = metric.value
+            else:
+                histograms[name] = metric.summary()
+        return {
+            'timestamp': time.time(),
+            'uptime': time.time() - self.created_at,
+            'enabled': self.enabled,
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms,
+        }
+
+    def export(self, path):
+        """把快照写入JSON文件（临时文件 + 重命名），成功返回True"""
+        temp_path = path + '.tmp'
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, path)
+            return True
+        except Exception as e:
+            Logger.error(f"MetricsRegistry: 导出指标快照失败: {e}")
+            return False
+
+    def _get(self, name, cls):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = cls(self, name)
+            self._metrics[name] = metric
+        return metric
+
+
+# 全局注册表，默认关闭；由 CameraScreen 按配置开启
+registry = MetricsRegistry()
+
+
+def counter(name):
+    """在全局注册表中获取或创建计数器"""
+    return registry.counter(name)
+
+
+def gauge(name):
+    """在全局注册表中获取或创建仪表"""
+    return registry.gauge(name)
+
+
+def histogram(name, buckets=LATENCY_BUCKETS_MS):
+    """在全局注册表中获取或创建直方图"""
+    return registry.histogram(name, buckets)
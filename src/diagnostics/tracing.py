@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+帧时间线追踪模块 - 记录带帧号和线程号的耗时区间，导出 Chrome trace_event JSON
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from kivy.logger import Logger
+
+
+class Span:
+    """一个耗时区间（用作上下文管理器）"""
+
+    __slots__ = ('tracer', 'name', 'frame_id', 'start')
+
+    def __init__(self, tracer, name, frame_id=None):
+        self.tracer = tracer
+        self.name = name
+        self.frame_id = frame_id
+        self.start = 0
+
+    def set_frame(self, frame_id):
+        """区间开始后才知道帧号时补记"""
+        self.frame_id = frame_id
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer._record(self.name, self.start, time.perf_counter_ns(), self.frame_id)
+        return False
+
+
+class _NullSpan:
+    """追踪关闭时使用的空区间（共享单例，不记录任何内容）"""
+
+    __slots__ = ()
+
+    def set_frame(self, frame_id):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """帧时间线追踪器
+
+    区间写入容量固定的环形缓冲区（deque），写满后丢弃最旧的区间，
+    内存占用有上限；追加操作本身是线程安全的，记录时不加锁。
+    关闭时 span() 直接返回共享的空区间。dump() 把缓冲区导出为
+    Chrome trace_event 格式，可用 chrome://tracing 或 Perfetto 打开，
+    按线程查看UI线程和各工作线程的时间线。
+
+    区间名按 `模块.操作` 命名，点号前的部分作为分类。
+    """
+
+    def __init__(self, capacity=20000, enabled=False):
+        self.enabled = enabled
+        self.capacity = capacity
+        self._spans = deque(maxlen=capacity)
+        self._thread_names = {}
+        self._origin = time.perf_counter_ns()
+
+        # 统计
+        self.recorded = 0
+        self.dumps = 0
+
+    def span(self, name, frame_id=None):
+        """创建一个区间：with tracer.span('camera.capture_frame', frame_id): ..."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, frame_id)
+
+    def set_capacity(self, capacity):
+        """修改缓冲区容量（保留最新的区间）"""
+        capacity = max(1, int(capacity))
+        if capacity != self.capacity:
+            self.capacity = capacity
+            self._spans = deque(self._copy_spans(), maxlen=capacity)
+
+    def clear(self):
+        """清空缓冲区"""
+        self._spans.clear()
+        self.recorded = 0
+
+    def events(self):
+        """缓冲区内容转换为 trace_event 列表（含线程名元数据）"""
+        pid = os.getpid()
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+             'args': {'name': thread_name}}
+            for tid, thread_name in list(self._thread_names.items())
+        ]
+        for name, start, duration, tid, frame_id in self._copy_spans():
+            event = {
+                'name': name,
+                'cat': name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': (start - self._origin) / 1000.0,
+                'dur': duration / 1000.0,
+                'pid': pid,
+                'tid': tid,
+            }
+            if frame_id is not None:
+                event['args'] = {'frame_id': frame_id}
+            events.append(event)
+        return events
+
+    def dump(self, path):
+        """导出为 Chrome trace_event JSON（临时文件 + 重命名），成功返回True"""
+        temp_path = path + '.tmp'
+        try:
+            data = {
+                'traceEvents': self.events(),
+                'displayTimeUnit': 'ms',
+                'otherData': {
+                    'recorded': self.recorded,
+                    'dropped': self.dropped,
+                },
+            }
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+            self.dumps += 1
+            Logger.info(f"Tracer: 已导出 {len(self._spans)} 个区间到 {path}")
+            return True
+        except Exception as e:
+            Logger.error(f"Tracer: 导出时间线失败: {e}")
+            return False
+
+    @property
+    def dropped(self):
+        """因缓冲区已满被丢弃的区间数"""
+        return max(0, self.recorded - self.capacity)
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'enabled': self.enabled,
+            'capacity': self.capacity,
+            'buffered': len(self._spans),
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'dumps': self.dumps,
+        }
+
+    def _record(self, name, start, end, frame_id):
+        """记录一个已结束的区间（任意线程）"""
+        tid = threading.get_native_id()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self._spans.append((name, start, end - start, tid, frame_id))
+        self.recorded += 1
+
+    def _copy_spans(self):
+        """复制缓冲区（其他线程追加导致迭代失败时重试）"""
+        while True:
+            try:
+                return list(self._spans)
+            except RuntimeError:
+                continue
+
+
+# 全局追踪器，默认关闭；由 CameraScreen 按配置开启
+tracer = Tracer()
+
+
+def span(name, frame_id=None):
+    """在全局追踪器上创建区间"""
+    return tracer.span(name, frame_id)
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+照片写入模块 - 后台队列保存照片，原子写入并嵌入评分信息
+"""
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+from PIL import Image
+
+from src.diagnostics import metrics, tracing
+
+
+# EXIF标签
+EXIF_IMAGE_DESCRIPTION = 0x010E
+EXIF_SOFTWARE = 0x0131
+
+EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'WEBP': '.webp',
+}
+
+
+class PhotoJob:
+    """一次保存任务"""
+
+    def __init__(self, photo, path, analysis=None, callback=None, release=None):
+        self.photo = photo
+        self.path = path
+        self.analysis = analysis
+        self.callback = callback
+        self.release = release
+        self.submitted_at = time.perf_counter()
+
+
+class PhotoWriter:
+    """照片写入器
+
+    UI线程 submit() 只预留文件名并把照片放入有界队列，立即返回；
+    编码和写盘在后台线程进行，先写临时文件再 fsync + 重命名，不会
+    留下写了一半的照片。队列满时拒绝新照片，内存占用不超过
+    max_queue 张照片。
+
+    写入线程按需启动，空闲 idle_timeout 秒后退出；线程不是守护线程，
+    应用退出时队列中的照片会写完。
+    """
+
+    def __init__(self, output_dir='photos', image_format='JPEG', quality=92,
+                 max_queue=4, idle_timeout=2.0, software='AI Composition Camera'):
+        self.output_dir = output_dir
+        self.image_format = image_format.upper()
+        self.extension = EXTENSIONS.get(self.image_format, '.jpg')
+        self.quality = quality
+        self.idle_timeout = idle_timeout
+        self.software = software
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._reserved = set()
+        self._last_stamp = None
+        self._sequence = 0
+
+        # 统计
+        self.submitted = 0
+        self.saved = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_latency = None
+        self.total_latency = 0.0
+
+        # 性能指标
+        self._queue_metric = metrics.gauge('save.queue_depth')
+        self._latency_metric = metrics.histogram('save.latency_ms')
+        self._failed_metric = metrics.counter('save.failed')
+        self._rejected_metric = metrics.counter('save.rejected')
+
+    @property
+    def queue_depth(self):
+        """等待写入的照片数"""
+        return self._queue.qsize()
+
+    def submit(self, photo, analysis=None, callback=None, release=None):
+        """提交照片（不阻塞）
+
+        返回预留的文件路径；队列已满时返回None。写入完成后在UI线程
+        调用 callback(path)，失败时 path 为None。照片来自缓冲区时传入
+        release，编码完成或被拒绝后以 release(photo) 归还。
+        """
+        with self._lock:
+            path = self._reserve_path()
+            job = PhotoJob(photo, path, analysis, callback, release)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._reserved.discard(path)
+                self.rejected += 1
+                self._rejected_metric.inc()
+                Logger.warning("PhotoWriter: 写入队列已满，照片被拒绝")
+                if release is not None:
+                    release(photo)
+                return None
+
+            self.submitted += 1
+            self._queue_metric.set(self._queue.qsize())
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='PhotoWriter'
+                )
+                self._thread.start()
+        return path
+
+    def flush(self):
+        """等待队列中的照片写完（退出前调用）"""
+        self._queue.join()
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'queue_depth': self.queue_depth,
+            'submitted': self.submitted,
+            'saved': self.saved,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'last_latency_ms': (self.last_latency * 1000
+                                if self.last_latency is not None else None),
+            'avg_latency_ms': (self.total_latency / self.saved * 1000
+                               if self.saved else None),
+        }
+
+    def _reserve_path(self):
+        """生成不重复的文件名（调用方持有锁）
+
+        时间戳精确到毫秒，同一毫秒内追加序号；同时检查已预留和已存在
+        的文件，连拍和重启后都不会覆盖旧照片。
+        """
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+        if stamp != self._last_stamp:
+            self._last_stamp = stamp
+            self._sequence = 0
+
+        while True:
+            suffix = f"_{self._sequence}" if self._sequence else ''
+            path = os.path.join(self.output_dir, f"photo_{stamp}{suffix}{self.extension}")
+            self._sequence += 1
+            if path not in self._reserved and not os.path.exists(path):
+                self._reserved.add(path)
+                return path
+
+    def _run(self):
+        """写入线程主循环，空闲超时后退出"""
+        while True:
+            try:
+                job = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    # 加锁后再确认，避免与 submit() 竞争
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+
+            with tracing.span('save.write'):
+                path = self._write(job)
+            latency = time.perf_counter() - job.submitted_at
+            with self._lock:
+                self._reserved.discard(job.path)
+            if job.release is not None:
+                job.release(job.photo)
+            job.photo = None
+
+            self._queue_metric.set(self._queue.qsize())
+            if path is not None:
+                self.saved += 1
+                self.last_latency = latency
+                self.total_latency += latency
+                self._latency_metric.observe(latency * 1000)
+                Logger.info(f"PhotoWriter: 照片已保存: {path}（{latency * 1000:.0f}ms）")
+            else:
+                self.failed += 1
+                self._failed_metric.inc()
+
+            if job.callback is not None:
+                Clock.schedule_once(
+                    lambda dt, callback=job.callback, path=path: callback(path), 0
+                )
+            self._queue.task_done()
+
+    def _write(self, job):
+        """编码并原子写入一张照片"""
+        temp_path = job.path + '.tmp'
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+
+            img = Image.fromarray(job.photo)
+            options = {'exif': self._build_exif(job.analysis)}
+            if self.image_format in ('JPEG', 'WEBP'):
+                options['quality'] = self.quality
+
+            with open(temp_path, 'wb') as f:
+                img.save(f, format=self.image_format, **options)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, job.path)
+            return job.path
+        except Exception as e:
+            Logger.error(f"PhotoWriter: 保存照片失败: {e}")
+            try:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            except OSError:
+                pass
+            return None
+
+    def _build_exif(self, analysis):
+        """生成EXIF（软件名和分析评分，EXIF字符串只支持ASCII）"""
+        exif = Image.Exif()
+        exif[EXIF_SOFTWARE] = self.software
+        if analysis:
+            score = analysis.get('score')
+            if score is not None:
+                exif[EXIF_IMAGE_DESCRIPTION] = f"score={score:.1f}"
+        return exif
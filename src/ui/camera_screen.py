@@ -3,6 +3,7 @@
 相机屏幕 - 主界面
 """
 
+from kivy.app import App
 from kivy.uix.screenmanager import Screen
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.button import Button
@@ -12,9 +13,17 @@ from kivy.logger import Logger
 from kivy.clock import Clock
 
 from src.camera.camera_manager import CameraManager
+from src.camera.frame_ring import BurstSelector
 from src.ai.local_analyzer import LocalAnalyzer
+from src.ai.analysis_worker import AnalysisWorker
 from src.ai.cloud_api import TencentCloudAPI
+from src.ai.cloud_worker import CloudAnalysisExecutor
 from src.composition.grid_overlay import GridOverlay
+from src.config_store import watch
+from src.diagnostics import metrics, tracing
+from src.storage.photo_writer import PhotoWriter
+from src.ui.display_updater import AnalysisDisplayUpdater
+from src.ui.perf_hud import PerfHud
 
 
 class CameraScreen(Screen):
@@ -30,9 +39,60 @@ class CameraScreen(Screen):
         self.cloud_api = TencentCloudAPI(config)
         self.grid_overlay = GridOverlay(config)
         
+        # 云端分析在线程池中执行，相似画面的重复请求合并
+        cloud_config = config.get('tencent_cloud', {})
+        self.cloud_executor = CloudAnalysisExecutor(
+            self.cloud_api,
+            max_workers=cloud_config.get('max_workers', 2),
+            max_distance=cloud_config.get('cache_max_distance', 6)
+        )
+        
+        # 照片在后台队列中写入，拍照按钮立即返回
+        storage_config = config.get('storage', {})
+        self.photo_writer = PhotoWriter(
+            output_dir=storage_config.get('output_dir', 'photos'),
+            image_format=storage_config.get('format', 'JPEG'),
+            quality=storage_config.get('quality', 92),
+            max_queue=storage_config.get('max_queue', 4)
+        )
+        
+        # 连拍模式下快门从最近几帧中选出评分最高的一帧
+        self.burst_selector = None
+        if self.camera_manager.frame_ring is not None:
+            self.burst_selector = BurstSelector(
+                self.camera_manager.frame_ring,
+                self.local_analyzer,
+                window=config.get('camera', {}).get('burst_window', 0.3)
+            )
+        
+        # 后台分析线程，结果回到UI线程后更新界面
+        self.analysis_worker = AnalysisWorker(
+            self.local_analyzer,
+            result_callback=self.on_analysis_result
+        )
+        
+        # 自适应帧率：分析耗时反馈给控制器，代理宽度变化同步给分析器
+        rate_controller = self.camera_manager.rate_controller
+        self.analysis_worker.latency_callback = rate_controller.record_analysis
+        rate_controller.on_change = self.on_analysis_rate_change
+        
+        # 性能指标（显示性能浮层时也会开启），可定期导出快照供现场诊断
+        diagnostics = config.get('diagnostics', {})
+        self.metrics_enabled = diagnostics.get('metrics_enabled', False)
+        self.snapshot_path = diagnostics.get('snapshot_path', 'data/metrics.json')
+        self.snapshot_interval = diagnostics.get('snapshot_interval', 0)
+        self._snapshot_event = None
+        
+        # 帧时间线追踪（设置页开关控制，导出见 SettingsScreen）
+        tracing.tracer.set_capacity(diagnostics.get('trace_capacity', 20000))
+        watch(config, 'diagnostics', 'trace_enabled', self.set_tracing_enabled, False)
+        
         # 分析结果
         self.current_analysis = None
         
+        # 已绑定暂停/退出事件的应用
+        self._bound_app = None
+        
         # 构建界面
         self.build_ui()
         
@@ -74,6 +134,29 @@ class CameraScreen(Screen):
         self.suggestion_label.bind(size=self.suggestion_label.setter('text_size'))
         layout.add_widget(self.suggestion_label)
         
+        # 标签更新统一经过更新器，内容不变时不触发重排
+        self.display_updater = AnalysisDisplayUpdater(
+            self.score_label,
+            self.suggestion_label
+        )
+        
+        # 性能浮层（设置页开关控制）
+        self.perf_label = Label(
+            text='',
+            size_hint=(None, None),
+            size=(360, 130),
+            pos_hint={'right': 0.98, 'top': 0.98},
+            color=(0.3, 1, 0.3, 1),
+            font_size='12sp',
+            halign='left',
+            valign='top',
+            opacity=0
+        )
+        self.perf_label.bind(size=self.perf_label.setter('text_size'))
+        layout.add_widget(self.perf_label)
+        self.perf_hud = PerfHud(self.perf_label)
+        watch(self.config, 'ui', 'show_perf_hud', self.set_perf_hud_visible, False)
+        
         # AI精准评分按钮
         self.cloud_button = Button(
             text='AI精准评分',
@@ -108,6 +191,10 @@ class CameraScreen(Screen):
         self.settings_button.bind(on_press=self.open_settings)
         layout.add_widget(self.settings_button)
         
+        # 辅助线指令只创建一次，尺寸变化时更新坐标
+        self.grid_overlay.attach(layout.canvas.after)
+        layout.bind(size=self.on_layout_size)
+        
         self.add_widget(layout)
         self.layout = layout
     
@@ -117,38 +204,101 @@ class CameraScreen(Screen):
         
         # 初始化分析器
         self.local_analyzer.initialize()
+        self.display_updater.reset()
+        self.analysis_worker.start()
         
         # 启动相机预览
         self.camera_manager.start_preview(callback=self.on_frame_captured)
+        
+        # 应用暂停时写入用量记录，退出时关闭云端线程池（只绑定一次，
+        # 屏幕创建时应用可能还没有运行，所以在首次进入时绑定）
+        app = App.get_running_app()
+        if app is not None and self._bound_app is not app:
+            if self._bound_app is not None:
+                self._bound_app.funbind('on_pause', self.on_app_pause)
+                self._bound_app.funbind('on_stop', self.shutdown)
+            app.fbind('on_pause', self.on_app_pause)
+            app.fbind('on_stop', self.shutdown)
+            self._bound_app = app
+        
+        if self.snapshot_interval > 0 and self._snapshot_event is None:
+            self._snapshot_event = Clock.schedule_interval(
+                self.export_metrics, self.snapshot_interval
+            )
     
     def on_leave(self):
         """离开屏幕时"""
         Logger.info("CameraScreen: 离开相机屏幕")
         self.camera_manager.stop_preview()
+        self.analysis_worker.stop()
+        
+        # 放弃未完成的云端分析，写入未落盘的用量记录
+        self.cloud_executor.cancel_all()
+        self.cloud_api.ledger.flush()
+        self.reset_cloud_button()
+        
+        if self._snapshot_event is not None:
+            self._snapshot_event.cancel()
+            self._snapshot_event = None
+        self.export_metrics()
+    
+    def on_app_pause(self, *args):
+        """应用切到后台（Android上之后可能被直接杀掉）"""
+        self.cloud_api.ledger.flush()
+        if hasattr(self.config, 'flush'):
+            self.config.flush()
+    
+    def shutdown(self, *args):
+        """应用退出时关闭后台线程并写入未保存的数据"""
+        Logger.info("CameraScreen: 关闭相机屏幕")
+        self.camera_manager.release()
+        self.analysis_worker.stop()
+        self.cloud_executor.shutdown()
+        self.photo_writer.flush()
+        if hasattr(self.config, 'flush'):
+            self.config.flush()
     
     def on_frame_captured(self, frame):
         """处理捕获的帧"""
-        # 本地分析
-        analysis = self.local_analyzer.analyze_frame(frame)
-        
+        # 投递到后台分析线程，旧帧未处理时会被新帧覆盖
+        self.analysis_worker.submit(frame)
+    
+    def on_analysis_result(self, analysis):
+        """本地分析完成（UI线程）"""
         if analysis:
             self.current_analysis = analysis
             self.update_ui(analysis)
     
+    def on_analysis_rate_change(self, fps, proxy_width):
+        """分析帧率或代理宽度被自适应调整"""
+        self.local_analyzer.proxy_width = proxy_width
+    
     def update_ui(self, analysis):
         """更新界面显示"""
-        # 更新评分
-        score = analysis.get('score', 0)
-        self.score_label.text = f'评分: {score:.1f}/10'
-        
-        # 更新建议
-        suggestions = analysis.get('suggestions', [])
-        if suggestions:
-            self.suggestion_label.text = '\n'.join(suggestions[:3])  # 最多显示3条
-        
-        # 绘制辅助线
-        # 注意：实际绘制需要在相机widget的canvas上进行
-        # 这里简化处理
+        with tracing.span('ui.update_ui', self.analysis_worker.delivered_frame_id):
+            # 评分平滑、建议去重，同一帧内合并为一次标签更新
+            self.display_updater.push_analysis(analysis)
+            
+            # 移动主体框（位置未变化时不做任何图形操作）
+            self.grid_overlay.set_subject(analysis.get('subject'))
+    
+    def set_perf_hud_visible(self, visible):
+        """显示或隐藏性能浮层"""
+        metrics.registry.enabled = bool(self.metrics_enabled or visible)
+        self.perf_hud.set_visible(visible)
+    
+    def set_tracing_enabled(self, enabled):
+        """开启或关闭帧时间线追踪"""
+        tracing.tracer.enabled = bool(enabled)
+    
+    def export_metrics(self, dt=None):
+        """把性能指标快照写入文件（指标关闭时跳过）"""
+        if metrics.registry.enabled and self.snapshot_path:
+            metrics.registry.export(self.snapshot_path)
+    
+    def on_layout_size(self, instance, size):
+        """界面尺寸变化时更新辅助线坐标"""
+        self.grid_overlay.update_layout(*size)
     
     def request_cloud_analysis(self, instance):
         """请求云端分析"""
@@ -158,38 +308,47 @@ class CameraScreen(Screen):
             self.show_message("云端API未配置")
             return
         
-        # 检查配额
-        quota = self.cloud_api.check_quota()
-        if quota['remaining'] <= 0:
-            self.show_message("API配额已用完")
-            return
-        
         # 捕获当前画面
         frame = self.camera_manager.capture_photo()
         if frame is None:
             self.show_message("无法获取画面")
             return
         
-        # 显示加载状态
+        # 相似画面已有结果时直接显示，不访问网络也不消耗配额
+        image_hash = self.cloud_api.image_hash(frame)
+        cached = self.cloud_api.lookup_cached(frame, image_hash)
+        if cached is not None:
+            self.show_cloud_result(cached)
+            return
+        
+        # 检查配额
+        quota = self.cloud_api.check_quota()
+        if quota['remaining'] <= 0:
+            self.show_message("API配额已用完")
+            return
+        
+        # 显示加载状态（按钮保持可用，重复点击由执行器合并）
         self.cloud_button.text = '分析中...'
-        self.cloud_button.disabled = True
         
-        # 异步调用API
-        Clock.schedule_once(lambda dt: self.do_cloud_analysis(frame), 0.1)
+        # 在工作线程中压缩、上传，结果回到UI线程
+        self.cloud_executor.submit(frame, self.on_cloud_result, image_hash)
     
-    def do_cloud_analysis(self, frame):
-        """执行云端分析"""
-        result = self.cloud_api.analyze_image(frame)
-        
-        # 恢复按钮状态
-        self.cloud_button.text = 'AI精准评分'
-        self.cloud_button.disabled = False
+    def on_cloud_result(self, result):
+        """云端分析完成（UI线程）"""
+        # 所有请求都完成后恢复按钮状态
+        if self.cloud_executor.pending_count == 0:
+            self.reset_cloud_button()
         
         if result:
             self.show_cloud_result(result)
         else:
             self.show_message("云端分析失败")
     
+    def reset_cloud_button(self):
+        """恢复云端评分按钮"""
+        self.cloud_button.text = 'AI精准评分'
+        self.cloud_button.disabled = False
+    
     def show_cloud_result(self, result):
         """显示云端分析结果"""
         score = result.get('aesthetic_score', 0)
@@ -199,41 +358,60 @@ class CameraScreen(Screen):
         message = f"云端评分: {score:.1f}/10 {rating}\n"
         message += '\n'.join(suggestions[:3])
         
-        self.suggestion_label.text = message
+        self.display_updater.push_message(message)
         Logger.info(f"CameraScreen: 云端评分: {score}")
     
     def capture_photo(self, instance):
-        """拍摄照片"""
+        """拍摄照片
+
+        连拍模式从已缓冲的预览帧中选优（零延迟，预览分辨率），否则按
+        拍摄分辨率拍照；两种方式都不中断预览。连拍模式下无法选优时
+        拒绝这次按键，不改用拍摄分辨率，输出分辨率不随按键时机变化。
+        """
         Logger.info("CameraScreen: 拍摄照片")
         
-        photo = self.camera_manager.capture_photo()
-        if photo is not None:
-            # 保存照片
-            self.save_photo(photo)
-            self.show_message("照片已保存")
-        else:
+        if self.burst_selector is not None:
+            self.camera_manager.refresh_ring()
+            if not self.burst_selector.select(self.on_burst_selected):
+                self.show_message("连拍画面未就绪，请稍候")
+            return
+        
+        if not self.camera_manager.capture_still(self.on_still_captured):
             self.show_message("拍照失败")
     
-    def save_photo(self, photo):
-        """保存照片"""
-        from PIL import Image
-        from datetime import datetime
-        
-        try:
-            # 生成文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"photo_{timestamp}.jpg"
-            
-            # 转换为PIL Image并保存
-            img = Image.fromarray(photo)
-            img.save(filename)
-            Logger.info(f"CameraScreen: 照片已保存: {filename}")
-        except Exception as e:
-            Logger.error(f"CameraScreen: 保存照片失败: {e}")
+    def on_burst_selected(self, photo, analysis):
+        """连拍选优完成（UI线程）"""
+        if photo is None:
+            self.show_message("拍照失败")
+            return
+        self.save_photo(photo, analysis=analysis)
+    
+    def on_still_captured(self, photo):
+        """照片拍摄完成（UI线程）"""
+        if photo is None:
+            self.show_message("拍照失败")
+            return
+        self.save_photo(photo, release=self.camera_manager.still_capture.release)
+    
+    def save_photo(self, photo, release=None, analysis=None):
+        """保存照片（交给后台写入队列，不阻塞UI线程）"""
+        path = self.photo_writer.submit(
+            photo, analysis or self.current_analysis,
+            callback=self.on_photo_saved, release=release
+        )
+        if path is None:
+            self.show_message("正在保存上一张照片，请稍候")
+    
+    def on_photo_saved(self, path):
+        """照片写入完成（UI线程）"""
+        if path:
+            self.show_message("照片已保存")
+        else:
+            self.show_message("保存照片失败")
     
     def show_message(self, message):
         """显示消息"""
-        self.suggestion_label.text = message
+        self.display_updater.push_message(message)
         Logger.info(f"CameraScreen: {message}")
     
     def open_settings(self, instance):
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+界面更新模块 - 合并分析结果的标签更新，只在内容变化时重绘
+"""
+
+from kivy.clock import Clock
+
+
+class AnalysisDisplayUpdater:
+    """分析结果显示更新器
+
+    修改 Label.text 会触发文字重排和纹理重建，因此：
+    - 评分做指数平滑，变化不超过滞回阈值时不更新
+    - 建议列表与当前显示内容比较，相同则不更新
+    - 同一帧内的多次提交合并为一次，在下一帧统一写入标签
+    """
+
+    def __init__(self, score_label, suggestion_label, smoothing=0.4,
+                 hysteresis=0.2, max_suggestions=3):
+        self.score_label = score_label
+        self.suggestion_label = suggestion_label
+        self.smoothing = smoothing
+        self.hysteresis = hysteresis
+        self.max_suggestions = max_suggestions
+
+        self._smoothed_score = None
+        self._shown_score = None
+        self._shown_suggestion = None
+        self._pending_score = None
+        self._pending_suggestion = None
+        self._commit_trigger = Clock.create_trigger(self._commit, 0)
+
+        # 统计
+        self.applied = 0
+        self.skipped = 0
+
+    def push_analysis(self, analysis):
+        """提交一次本地分析结果"""
+        score = analysis.get('score', 0)
+        if self._smoothed_score is None:
+            self._smoothed_score = score
+        else:
+            self._smoothed_score += self.smoothing * (score - self._smoothed_score)
+        self._pending_score = self._smoothed_score
+
+        suggestions = analysis.get('suggestions', [])
+        if suggestions:
+            self._pending_suggestion = '\n'.join(suggestions[:self.max_suggestions])
+
+        self._commit_trigger()
+
+    def push_message(self, text):
+        """提交一条直接显示在建议区的消息"""
+        self._pending_suggestion = text
+        self._commit_trigger()
+
+    def reset(self):
+        """清除平滑状态（例如重新进入屏幕时）"""
+        self._smoothed_score = None
+        self._pending_score = None
+        self._pending_suggestion = None
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'applied': self.applied,
+            'skipped': self.skipped,
+        }
+
+    def _commit(self, dt):
+        """把待更新内容写入标签（每帧最多一次）"""
+        score = self._pending_score
+        if score is not None:
+            self._pending_score = None
+            if (self._shown_score is not None
+                    and abs(score - self._shown_score) < self.hysteresis):
+                self.skipped += 1
+            else:
+                self._shown_score = score
+                self.score_label.text = f'评分: {score:.1f}/10'
+                self.applied += 1
+
+        text = self._pending_suggestion
+        if text is not None:
+            self._pending_suggestion = None
+            if text == self._shown_suggestion:
+                self.skipped += 1
+            else:
+                self._shown_suggestion = text
+                self.suggestion_label.text = text
+                self.applied += 1
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+性能浮层模块 - 在相机界面上显示帧率、各阶段耗时和队列深度
+"""
+
+import time
+
+from kivy.clock import Clock
+
+from src.diagnostics import metrics
+
+
+class PerfHud:
+    """性能浮层
+
+    每 interval 秒从指标注册表读取一次数据写入标签，内容不变时不
+    更新标签；隐藏时停止定时器，不产生任何开销。计数类指标按两次
+    刷新之间的差值换算为每秒速率。
+    """
+
+    def __init__(self, label, registry=None, interval=0.5):
+        self.label = label
+        self.registry = registry or metrics.registry
+        self.interval = interval
+        self.visible = False
+        self._event = None
+        self._last_counts = {}
+        self._last_time = None
+
+    def show(self):
+        """显示并开始刷新"""
+        self.visible = True
+        self.label.opacity = 1
+        if self._event is None:
+            self._last_counts = {}
+            self._last_time = None
+            self._event = Clock.schedule_interval(self.refresh, self.interval)
+        self.refresh(0)
+
+    def hide(self):
+        """隐藏并停止刷新"""
+        self.visible = False
+        self.label.opacity = 0
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def set_visible(self, visible):
+        """按开关显示或隐藏"""
+        if visible:
+            self.show()
+        else:
+            self.hide()
+
+    def refresh(self, dt):
+        """读取指标并更新标签"""
+        now = time.perf_counter()
+        elapsed = now - self._last_time if self._last_time is not None else 0
+
+        lines = [
+            f"UI {Clock.get_fps():.0f}fps  "
+            f"采集 {self._rate('camera.frames', elapsed)}/s "
+            f"目标 {self._value('camera.target_fps')}fps  "
+            f"丢帧 {self._value('camera.dropped')}",
+            f"分析 {self._latency('analysis.latency_ms')}  "
+            f"{self._rate('analysis.frames', elapsed)}/s "
+            f"覆盖 {self._value('analysis.dropped')}",
+            f"采集 {self._latency('camera.capture_ms')}  "
+            f"叠加 {self._latency('overlay.update_ms')}",
+            f"云端 {self._latency('cloud.rtt_ms')}  "
+            f"任务 {self._latency('cloud.task_ms')}  "
+            f"排队 {self._value('cloud.pending')}",
+            f"保存 {self._latency('save.latency_ms')}  "
+            f"队列 {self._value('save.queue_depth')}",
+        ]
+        self._last_time = now
+
+        text = '\n'.join(lines)
+        if text != self.label.text:
+            self.label.text = text
+
+    def _value(self, name):
+        """计数器或仪表的当前值"""
+        metric = self.registry.get(name)
+        value = metric.value if metric is not None else None
+        return '--' if value is None else value
+
+    def _rate(self, name, elapsed):
+        """计数器在两次刷新之间的每秒增量"""
+        metric = self.registry.get(name)
+        if metric is None:
+            return '--'
+        last = self._last_counts.get(name)
+        self._last_counts[name] = metric.value
+        if last is None or elapsed <= 0:
+            return '--'
+        return f"{(metric.value - last) / elapsed:.1f}"
+
+    def _latency(self, name):
+        """直方图的 p50/p95（毫秒，按分桶估计）"""
+        metric = self.registry.get(name)
+        if metric is None or metric.count == 0:
+            return '--'
+        return f"p50 {metric.percentile(50):g}/p95 {metric.percentile(95):g}ms"
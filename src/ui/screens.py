@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+屏幕组装模块 - 用同一个配置存储创建相机屏幕和设置屏幕
+"""
+
+from kivy.uix.screenmanager import ScreenManager
+from kivy.logger import Logger
+
+from src.config_store import ensure_store
+from src.ui.camera_screen import CameraScreen
+from src.ui.settings_screen import SettingsScreen
+
+
+def create_screen_manager(config, config_path='config/config.json'):
+    """创建包含相机屏幕和设置屏幕的 ScreenManager
+
+    config 可以是 ConfigStore 或配置字典；字典会包装为 ConfigStore，
+    修改保存到 config_path。两个屏幕共享同一个存储，设置页的开关
+    通过变更通知即时作用于相机页。
+    """
+    store = ensure_store(config, path=config_path)
+    manager = ScreenManager()
+    manager.add_widget(CameraScreen(store, name='camera'))
+    manager.add_widget(SettingsScreen(store, name='settings'))
+    Logger.info(f"Screens: 屏幕创建完成，配置保存到 {store.path}")
+    return manager
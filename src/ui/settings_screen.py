@@ -11,6 +11,9 @@ from kivy.uix.switch import Switch
 from kivy.uix.textinput import TextInput
 from kivy.logger import Logger
 
+from src.config_store import set_value
+from src.diagnostics import tracing
+
 
 class SettingsScreen(Screen):
     """设置屏幕"""
@@ -40,6 +43,7 @@ class SettingsScreen(Screen):
         layout.add_widget(self.create_switch_item('显示网格线', 'show_grid'))
         layout.add_widget(self.create_switch_item('显示黄金分割', 'show_golden_ratio'))
         layout.add_widget(self.create_switch_item('显示评分', 'show_local_score'))
+        layout.add_widget(self.create_switch_item('显示性能信息', 'show_perf_hud'))
         
         # 云端API设置
         layout.add_widget(self.create_section_title('云端API'))
@@ -53,9 +57,20 @@ class SettingsScreen(Screen):
             multiline=False,
             size_hint=(0.7, 1)
         )
+        self.api_key_input.bind(on_text_validate=self.on_api_key_change)
         api_layout.add_widget(self.api_key_input)
         layout.add_widget(api_layout)
         
+        # 诊断
+        layout.add_widget(self.create_section_title('诊断'))
+        layout.add_widget(self.create_switch_item('记录帧时间线', 'trace_enabled'))
+        self.trace_button = Button(
+            text='导出帧时间线',
+            size_hint=(1, 0.08)
+        )
+        self.trace_button.bind(on_press=self.on_dump_trace)
+        layout.add_widget(self.trace_button)
+        
         # 返回按钮
         back_button = Button(
             text='返回',
@@ -94,17 +109,37 @@ class SettingsScreen(Screen):
         
         return item_layout
     
+    def get_config_path(self, key):
+        """开关对应的配置节和配置项"""
+        if key == 'cloud_enabled':
+            return 'tencent_cloud', 'enabled'
+        if key == 'trace_enabled':
+            return 'diagnostics', key
+        return 'ui', key
+    
     def get_config_value(self, key):
         """获取配置值"""
-        if key == 'cloud_enabled':
-            return self.config.get('tencent_cloud', {}).get('enabled', False)
-        else:
-            return self.config.get('ui', {}).get(key, True)
+        section, name = self.get_config_path(key)
+        default = key not in ('cloud_enabled', 'show_perf_hud', 'trace_enabled')
+        return self.config.get(section, {}).get(name, default)
     
     def on_switch_change(self, key, value):
-        """开关变化时"""
+        """开关变化时（使用配置存储时通知订阅者，并延迟合并写盘）"""
         Logger.info(f"SettingsScreen: {key} = {value}")
-        # 这里应该保存配置到文件
+        section, name = self.get_config_path(key)
+        set_value(self.config, section, name, value)
+    
+    def on_api_key_change(self, instance):
+        """API Key 输入确认时"""
+        set_value(self.config, 'tencent_cloud', 'api_key', instance.text.strip())
+    
+    def on_dump_trace(self, instance):
+        """把帧时间线导出为 Chrome trace JSON"""
+        path = self.config.get('diagnostics', {}).get('trace_path', 'data/trace.json')
+        if tracing.tracer.dump(path):
+            instance.text = f'已导出 {tracing.tracer.get_stats()["buffered"]} 个区间'
+        else:
+            instance.text = '导出失败'
     
     def go_back(self, instance):
         """返回相机屏幕"""